@@ -0,0 +1,72 @@
+"""Agregações numéricas usadas pelos gráficos, sem dependência da interface."""
+import numpy as np
+
+MESES_ABREVIADOS = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
+                    'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+
+
+def indice_mes(ano, mes):
+    """Número sequencial do mês, para que intervalos de vários anos sejam contíguos."""
+    return ano * 12 + mes - 1
+
+
+def evolucao_mensal(linhas, inicio, fim):
+    """Monta a série mensal de receitas, despesas e saldos de inicio a fim.
+
+    `linhas` são tuplas (ano, mes, receitas, despesas), uma por mês com
+    movimento, como retornadas por BancoDados.evolucao_mensal; `inicio` e `fim`
+    são (ano, mes), inclusive. Meses sem movimento ficam com zero. Os valores
+    são centavos inteiros, então as somas e o saldo acumulado são exatos. Todo
+    o cálculo é vetorizado, então o custo é linear no número de meses.
+    """
+    base = indice_mes(*inicio)
+    quantidade = indice_mes(*fim) - base + 1
+    receitas = np.zeros(quantidade, dtype=np.int64)
+    despesas = np.zeros(quantidade, dtype=np.int64)
+    if linhas:
+        dados = np.asarray(linhas, dtype=np.int64)
+        posicoes = dados[:, 0] * 12 + dados[:, 1] - 1 - base
+        np.add.at(receitas, posicoes, dados[:, 2])
+        np.add.at(despesas, posicoes, dados[:, 3])
+    indices = np.arange(base, base + quantidade)
+    saldo = receitas - despesas
+    return {
+        'anos': indices // 12,
+        'meses': indices % 12 + 1,
+        'receitas': receitas,
+        'despesas': despesas,
+        'saldo': saldo,
+        'saldo_acumulado': np.cumsum(saldo),
+    }
+
+
+def receitas_despesas(linhas):
+    """Converte as tuplas (ano, mes, tipo, categoria, total) de
+    BancoDados.totais_periodo no formato (ano, mes, receitas, despesas) de
+    evolucao_mensal (que soma as repetidas do mesmo mês)."""
+    return [(ano, mes, total if tipo == 'Receita' else 0, total if tipo == 'Despesa' else 0)
+            for ano, mes, tipo, _, total in linhas if tipo in ('Receita', 'Despesa')]
+
+
+def series_categorias(linhas, inicio, fim, tipo='Despesa'):
+    """Série mensal de cada categoria do `tipo`, de inicio a fim ((ano, mes), inclusive).
+
+    Retorna (categorias, matriz categorias x meses em centavos), com as
+    categorias em ordem decrescente de total no período.
+    """
+    base = indice_mes(*inicio)
+    quantidade = indice_mes(*fim) - base + 1
+    linhas = [linha for linha in linhas if linha[2] == tipo]
+    categorias = sorted({linha[3] for linha in linhas})
+    matriz = np.zeros((len(categorias), quantidade), dtype=np.int64)
+    if linhas:
+        posicao_categoria = {categoria: i for i, categoria in enumerate(categorias)}
+        np.add.at(matriz,
+                  ([posicao_categoria[linha[3]] for linha in linhas],
+                   [linha[0] * 12 + linha[1] - 1 - base for linha in linhas]),
+                  [linha[4] for linha in linhas])
+        ordem = np.argsort(-matriz.sum(axis=1), kind='stable')
+        categorias = [categorias[i] for i in ordem]
+        matriz = matriz[ordem]
+    return categorias, matriz
+
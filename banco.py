@@ -0,0 +1,1036 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from urllib.request import pathname2url
+
+import perfil
+
+# Caminho do banco: pode ser sobrescrito pela variável de ambiente EVA_CFP_DB
+CAMINHO_PADRAO = os.environ.get('EVA_CFP_DB', 'financas.db')
+
+CATEGORIAS_PADRAO = ["Alimentação", "Transporte", "Moradia", "Lazer", "Outros"]
+
+# Pragmas aplicados uma única vez na abertura da conexão. O modo WAL fica
+# gravado no arquivo, então só as conexões que podem escrever o ativam
+PRAGMA_WAL = 'PRAGMA journal_mode = WAL'
+PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA foreign_keys = ON',
+)
+
+# Conexões de leitura ociosas que cada banco guarda para as próximas tarefas
+MAXIMO_CONEXOES_LIVRES = 4
+
+# Bancos que emprestaram uma conexão à tarefa em andamento nesta thread
+_emprestimos = threading.local()
+
+
+def devolver_conexoes():
+    """Devolve aos bancos as conexões de leitura usadas pela thread atual.
+
+    Chamada ao fim de cada tarefa (tarefas.Tarefa.run): as threads do
+    QThreadPool não conservam o estado entre uma tarefa e outra e expiram
+    quando ociosas, então a conexão volta para o banco em vez de ficar presa
+    à thread.
+    """
+    for banco in getattr(_emprestimos, 'bancos', ()):
+        banco._devolver_conexao()
+    _emprestimos.bancos = []
+
+
+# As consultas ficam em constantes para que o cache de statements do sqlite3
+# reaproveite sempre o mesmo statement preparado
+SQL_LISTAR_CATEGORIAS = 'SELECT categoria FROM categorias ORDER BY categoria'
+SQL_ADICIONAR_CATEGORIA = 'INSERT INTO categorias (categoria) VALUES (?)'
+SQL_REMOVER_CATEGORIA = 'DELETE FROM categorias WHERE categoria = ?'
+SQL_GARANTIR_CATEGORIA = 'INSERT OR IGNORE INTO categorias (categoria) VALUES (?)'
+SQL_ID_CATEGORIA = 'SELECT id FROM categorias WHERE categoria = ?'
+# Renomear só altera a linha de categorias; as transações guardam o id
+SQL_RENOMEAR_CATEGORIA = 'UPDATE categorias SET categoria = ? WHERE categoria = ?'
+# Mesclar move as transações de uma categoria para outra pelo índice de categoria_id
+SQL_MOVER_CATEGORIA = 'UPDATE transacoes SET categoria_id = ? WHERE categoria_id = ?'
+SQL_MOVER_CATEGORIA_RECORRENCIAS = 'UPDATE recorrencias SET categoria_id = ? WHERE categoria_id = ?'
+SQL_REMOVER_CATEGORIA_ID = 'DELETE FROM categorias WHERE id = ?'
+
+# Regras de transações recorrentes; `materializadas` conta as ocorrências já
+# lançadas em transacoes (ver recorrencias.py)
+SQL_LISTAR_RECORRENCIAS = '''
+    SELECT r.id, r.descricao, r.tipo, r.valor_centavos, c.categoria, r.frequencia,
+           r.inicio, r.fim, r.materializadas
+    FROM recorrencias r
+    LEFT JOIN categorias c ON c.id = r.categoria_id
+    ORDER BY r.descricao, r.id
+'''
+SQL_ADICIONAR_RECORRENCIA = '''
+    INSERT INTO recorrencias (descricao, tipo, valor_centavos, categoria_id, frequencia, inicio, fim)
+    VALUES (?, ?, ?, (SELECT id FROM categorias WHERE categoria = ?), ?, ?, ?)
+'''
+SQL_REMOVER_RECORRENCIA = 'DELETE FROM recorrencias WHERE id = ?'
+SQL_ATUALIZAR_MATERIALIZADAS = 'UPDATE recorrencias SET materializadas = ? WHERE id = ?'
+
+# Exportação e sincronização. alteracoes_transacoes guarda, por transação, a
+# versão da última alteração (e se foi removida), mantida por gatilhos; um
+# export incremental lê só o que passou da versão sincronizada por último.
+# Cada exportação fecha a versão corrente (versao_alteracoes), então tudo o
+# que foi gravado entre duas exportações tem a mesma versão.
+TAMANHO_LOTE_EXPORTACAO = 5000
+# Fecha a versão corrente: o que for gravado depois fica na seguinte
+SQL_AVANCAR_VERSAO = 'UPDATE versao_alteracoes SET versao = versao + 1 WHERE id = 1 RETURNING versao - 1'
+SQL_EXPORTAR_TRANSACOES = '''
+    SELECT id, data, tipo, valor_centavos, descricao, categoria
+    FROM transacoes_completas
+    ORDER BY id
+'''
+SQL_EXPORTAR_ALTERADAS = '''
+    SELECT t.id, t.data, t.tipo, t.valor_centavos, t.descricao, t.categoria
+    FROM alteracoes_transacoes a
+    JOIN transacoes_completas t ON t.id = a.id
+    WHERE a.versao > ? AND a.versao <= ? AND a.removida = 0
+    ORDER BY a.id
+'''
+SQL_REMOVIDAS_DESDE = '''
+    SELECT id FROM alteracoes_transacoes
+    WHERE versao > ? AND versao <= ? AND removida = 1
+    ORDER BY id
+'''
+# Importação de backup: a transação mantém o id de origem
+SQL_GRAVAR_TRANSACAO = '''
+    INSERT INTO transacoes (id, data, tipo, valor_centavos, descricao, categoria_id)
+    VALUES (?, ?, ?, ?, ?, (SELECT id FROM categorias WHERE categoria = ?))
+    ON CONFLICT (id) DO UPDATE SET
+        data = excluded.data, tipo = excluded.tipo, valor_centavos = excluded.valor_centavos,
+        descricao = excluded.descricao, categoria_id = excluded.categoria_id
+'''
+SQL_REMOVER_TRANSACAO = 'DELETE FROM transacoes WHERE id = ?'
+SQL_LIMPAR_TRANSACOES = 'DELETE FROM transacoes'
+SQL_VERSAO_SINCRONIZADA = 'SELECT versao FROM sincronizacoes WHERE destino = ?'
+SQL_REGISTRAR_SINCRONIZACAO = '''
+    INSERT INTO sincronizacoes (destino, versao) VALUES (?, ?)
+    ON CONFLICT (destino) DO UPDATE SET versao = excluded.versao
+'''
+
+# Valores são guardados e somados em centavos inteiros, sem erro de arredondamento
+# A categoria é recebida pelo nome e gravada pelo id
+SQL_ADICIONAR_TRANSACAO = '''
+    INSERT INTO transacoes (data, tipo, valor_centavos, descricao, categoria_id)
+    VALUES (?, ?, ?, ?, (SELECT id FROM categorias WHERE categoria = ?))
+'''
+# Importações usam id_externo (índice único parcial) para ignorar duplicatas
+SQL_IMPORTAR_TRANSACAO = '''
+    INSERT OR IGNORE INTO transacoes (data, tipo, valor_centavos, descricao, categoria_id, id_externo)
+    VALUES (?, ?, ?, ?, (SELECT id FROM categorias WHERE categoria = ?), ?)
+'''
+SQL_REMOVER_TRANSACOES = 'DELETE FROM transacoes WHERE id IN ({marcadores})'
+# Limite de ids por DELETE, abaixo do máximo de parâmetros do SQLite
+TAMANHO_LOTE_REMOCAO = 500
+# Os filtros por período usam intervalos [início, fim) sobre a coluna data,
+# que podem ser resolvidos pelos índices (ao contrário de strftime(data)).
+# A paginação é por chave (data, id), sem OFFSET, para que buscar a página N
+# não exija percorrer as N-1 anteriores.
+SQL_PAGINA_TRANSACOES = '''
+    SELECT id, data, tipo, valor_centavos, descricao, categoria
+    FROM transacoes_completas
+    {filtro}
+    ORDER BY data DESC, id DESC
+    LIMIT ?
+'''
+# A busca textual resolve os termos no índice FTS5 e devolve só os ids,
+# que então se combinam com os demais filtros sobre transacoes. Com '+id' o
+# SQLite deixa de buscar cada id pela chave primária e percorre o índice de
+# data, já na ordem da página, conferindo os ids encontrados.
+SQL_BUSCA_TEXTUAL = '{coluna} IN (SELECT rowid FROM transacoes_fts WHERE transacoes_fts MATCH ?)'
+SQL_CONTAR_BUSCA = '''
+    SELECT COUNT(*) FROM (SELECT rowid FROM transacoes_fts WHERE transacoes_fts MATCH ? LIMIT ?)
+'''
+# Até este número de resultados, ordenar os encontrados é mais barato que
+# percorrer o índice de data até completar a página
+LIMITE_BUSCA_ESPARSA = 5000
+SQL_CORRESPONDE_FILTRO = 'SELECT 1 FROM transacoes WHERE id = ? AND {condicoes}'
+
+# Saldo e gráficos leem da tabela totais_mensais, mantida pelos gatilhos,
+# e custam O(meses x categorias) em vez de O(transações)
+SQL_SALDO = '''
+    SELECT COALESCE(SUM(CASE WHEN tipo = 'Receita' THEN total ELSE -total END), 0)
+    FROM totais_mensais
+    {filtro}
+'''
+# Saldo das transações que atendem a filtros que totais_mensais não cobre
+SQL_SALDO_FILTRADO = '''
+    SELECT COALESCE(SUM(CASE WHEN tipo = 'Receita' THEN valor_centavos ELSE -valor_centavos END), 0)
+    FROM transacoes
+    {filtro}
+'''
+SQL_DESPESAS_CATEGORIA = '''
+    SELECT COALESCE(c.categoria, ''), t.total
+    FROM totais_mensais t
+    LEFT JOIN categorias c ON c.id = t.categoria_id
+    WHERE t.ano = ? AND t.mes = ? AND t.tipo = 'Despesa'
+    ORDER BY 1
+'''
+SQL_EVOLUCAO_MENSAL = '''
+    SELECT
+        ano,
+        mes,
+        SUM(CASE WHEN tipo = 'Receita' THEN total ELSE 0 END) as receitas,
+        SUM(CASE WHEN tipo = 'Despesa' THEN total ELSE 0 END) as despesas
+    FROM totais_mensais
+    WHERE (ano, mes) >= (?, ?) AND (ano, mes) <= (?, ?)
+    GROUP BY ano, mes
+    ORDER BY ano, mes
+'''
+# Totais de um período qualquer: os meses inteiros vêm de totais_mensais e só
+# os dias das pontas (meses incompletos) são somados das transações
+SQL_TOTAIS_MESES = '''
+    SELECT t.ano, t.mes, t.tipo, COALESCE(c.categoria, ''), t.total
+    FROM totais_mensais t
+    LEFT JOIN categorias c ON c.id = t.categoria_id
+    WHERE (t.ano, t.mes) >= (?, ?) AND (t.ano, t.mes) <= (?, ?)
+'''
+SQL_TOTAIS_DIAS = '''
+    SELECT CAST(substr(t.data, 1, 4) AS INTEGER), CAST(substr(t.data, 6, 2) AS INTEGER),
+           COALESCE(t.tipo, ''), COALESCE(c.categoria, ''), SUM(t.valor_centavos)
+    FROM transacoes t
+    LEFT JOIN categorias c ON c.id = t.categoria_id
+    WHERE t.data >= ? AND t.data < ?
+    GROUP BY 1, 2, 3, 4
+'''
+
+
+# As versões antigas do esquema agrupavam pelo nome da categoria; a atual,
+# pelo id (sem categoria = 0)
+CATEGORIA_TEXTO = ('categoria', 'TEXT', "''")
+CATEGORIA_ID = ('categoria_id', 'INTEGER', '0')
+
+
+def sql_tabela_totais_mensais(tipo_total, categoria=CATEGORIA_TEXTO):
+    coluna_categoria, tipo_categoria, _ = categoria
+    return f'''CREATE TABLE IF NOT EXISTS totais_mensais (
+        ano INTEGER NOT NULL,
+        mes INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        {coluna_categoria} {tipo_categoria} NOT NULL,
+        total {tipo_total} NOT NULL DEFAULT 0,
+        quantidade INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (ano, mes, tipo, {coluna_categoria})
+    ) WITHOUT ROWID'''
+
+
+def sql_gatilhos_totais_mensais(coluna, categoria=CATEGORIA_TEXTO):
+    """Gatilhos que mantêm totais_mensais em dia, somando a coluna de valor dada."""
+    coluna_categoria, _, sem_categoria = categoria
+    remover_antigo = f'''
+            UPDATE totais_mensais
+            SET total = total - old.{coluna}, quantidade = quantidade - 1
+            WHERE ano = CAST(substr(old.data, 1, 4) AS INTEGER)
+            AND mes = CAST(substr(old.data, 6, 2) AS INTEGER)
+            AND tipo = COALESCE(old.tipo, '')
+            AND {coluna_categoria} = COALESCE(old.{coluna_categoria}, {sem_categoria});'''
+    somar_novo = f'''
+            INSERT INTO totais_mensais (ano, mes, tipo, {coluna_categoria}, total, quantidade)
+            VALUES (CAST(substr(new.data, 1, 4) AS INTEGER), CAST(substr(new.data, 6, 2) AS INTEGER),
+                    COALESCE(new.tipo, ''), COALESCE(new.{coluna_categoria}, {sem_categoria}),
+                    new.{coluna}, 1)
+            ON CONFLICT (ano, mes, tipo, {coluna_categoria}) DO UPDATE
+            SET total = total + excluded.total, quantidade = quantidade + 1;'''
+    # Só a linha da chave antiga pode ter zerado: apagá-la pela chave evita
+    # percorrer totais_mensais a cada transação alterada
+    limpar = f'''
+            DELETE FROM totais_mensais
+            WHERE ano = CAST(substr(old.data, 1, 4) AS INTEGER)
+            AND mes = CAST(substr(old.data, 6, 2) AS INTEGER)
+            AND tipo = COALESCE(old.tipo, '')
+            AND {coluna_categoria} = COALESCE(old.{coluna_categoria}, {sem_categoria})
+            AND quantidade <= 0;'''
+    return (
+        f'''CREATE TRIGGER IF NOT EXISTS trg_totais_mensais_insert
+        AFTER INSERT ON transacoes
+        BEGIN{somar_novo}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_totais_mensais_delete
+        AFTER DELETE ON transacoes
+        BEGIN{remover_antigo}{limpar}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_totais_mensais_update
+        AFTER UPDATE OF data, tipo, {coluna}, {coluna_categoria} ON transacoes
+        BEGIN{remover_antigo}{somar_novo}{limpar}
+        END''',
+    )
+
+
+def sql_preencher_totais_mensais(coluna, categoria=CATEGORIA_TEXTO):
+    coluna_categoria, _, sem_categoria = categoria
+    return f'''INSERT INTO totais_mensais (ano, mes, tipo, {coluna_categoria}, total, quantidade)
+        SELECT CAST(substr(data, 1, 4) AS INTEGER), CAST(substr(data, 6, 2) AS INTEGER),
+               COALESCE(tipo, ''), COALESCE({coluna_categoria}, {sem_categoria}), SUM({coluna}), COUNT(*)
+        FROM transacoes
+        GROUP BY 1, 2, 3, 4'''
+
+
+def sql_indice_busca(conteudo='transacoes', categoria=CATEGORIA_TEXTO):
+    """Índice FTS5 (conteúdo externo) sobre descrição e categoria, com gatilhos.
+
+    Acentos e maiúsculas são ignorados; os índices de prefixo deixam a busca
+    enquanto se digita tão rápida quanto a de termos completos. Com categoria
+    por id, o conteúdo vem de uma view que traz o nome da categoria.
+    """
+    coluna_categoria = categoria[0]
+
+    def nome_categoria(linha):
+        if categoria is CATEGORIA_TEXTO:
+            return f'{linha}.categoria'
+        return f'(SELECT categoria FROM categorias WHERE id = {linha}.categoria_id)'
+
+    return (
+        f'''CREATE VIRTUAL TABLE IF NOT EXISTS transacoes_fts USING fts5(
+            descricao, categoria,
+            content = '{conteudo}', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        )''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_transacoes_fts_insert
+        AFTER INSERT ON transacoes
+        BEGIN
+            INSERT INTO transacoes_fts (rowid, descricao, categoria)
+            VALUES (new.id, new.descricao, {nome_categoria('new')});
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_transacoes_fts_delete
+        AFTER DELETE ON transacoes
+        BEGIN
+            INSERT INTO transacoes_fts (transacoes_fts, rowid, descricao, categoria)
+            VALUES ('delete', old.id, old.descricao, {nome_categoria('old')});
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_transacoes_fts_update
+        AFTER UPDATE OF descricao, {coluna_categoria} ON transacoes
+        BEGIN
+            INSERT INTO transacoes_fts (transacoes_fts, rowid, descricao, categoria)
+            VALUES ('delete', old.id, old.descricao, {nome_categoria('old')});
+            INSERT INTO transacoes_fts (rowid, descricao, categoria)
+            VALUES (new.id, new.descricao, {nome_categoria('new')});
+        END''',
+        "INSERT INTO transacoes_fts (transacoes_fts) VALUES ('rebuild')",
+    )
+
+
+# Ao renomear uma categoria, só o índice de busca precisa ser refeito para as
+# transações dela (encontradas pelo índice de categoria_id)
+SQL_GATILHO_RENOMEAR_CATEGORIA = '''CREATE TRIGGER IF NOT EXISTS trg_categorias_renomear
+    AFTER UPDATE OF categoria ON categorias
+    BEGIN
+        INSERT INTO transacoes_fts (transacoes_fts, rowid, descricao, categoria)
+        SELECT 'delete', id, descricao, old.categoria FROM transacoes WHERE categoria_id = old.id;
+        INSERT INTO transacoes_fts (rowid, descricao, categoria)
+        SELECT id, descricao, new.categoria FROM transacoes WHERE categoria_id = new.id;
+    END'''
+
+
+def sql_gatilhos_alteracoes():
+    """Gatilhos que registram em alteracoes_transacoes a versão de cada mudança."""
+    # A versão corrente, lida do contador, e não um MAX + 1 a cada linha gravada
+    proxima_versao = '(SELECT versao FROM versao_alteracoes WHERE id = 1)'
+    def registrar(linha, removida):
+        return f'''
+            INSERT INTO alteracoes_transacoes (id, versao, removida)
+            VALUES ({linha}.id, {proxima_versao}, {removida})
+            ON CONFLICT (id) DO UPDATE SET versao = excluded.versao, removida = excluded.removida;'''
+
+    return (
+        f'''CREATE TRIGGER trg_alteracoes_insert
+        AFTER INSERT ON transacoes
+        BEGIN{registrar('new', 0)}
+        END''',
+        f'''CREATE TRIGGER trg_alteracoes_update
+        AFTER UPDATE ON transacoes
+        BEGIN{registrar('new', 0)}
+        END''',
+        f'''CREATE TRIGGER trg_alteracoes_delete
+        AFTER DELETE ON transacoes
+        BEGIN{registrar('old', 1)}
+        END''',
+        # Renomear a categoria muda o que se exporta das transações dela
+        f'''CREATE TRIGGER trg_alteracoes_categoria
+        AFTER UPDATE OF categoria ON categorias
+        BEGIN
+            UPDATE alteracoes_transacoes SET versao = {proxima_versao}
+            WHERE id IN (SELECT id FROM transacoes WHERE categoria_id = new.id);
+        END''',
+    )
+
+
+# Migrações de esquema, aplicadas em ordem conforme PRAGMA user_version.
+# A posição na lista (a partir de 1) é a versão resultante.
+MIGRACOES = [
+    # 1: índices para filtros por período
+    (
+        'CREATE INDEX IF NOT EXISTS idx_transacoes_data ON transacoes (data)',
+        'CREATE INDEX IF NOT EXISTS idx_transacoes_tipo_data_categoria '
+        'ON transacoes (tipo, data, categoria, valor)',
+    ),
+    # 2: totais mensais materializados, mantidos por gatilhos
+    (
+        sql_tabela_totais_mensais('REAL'),
+        *sql_gatilhos_totais_mensais('valor'),
+        sql_preencher_totais_mensais('valor'),
+    ),
+    # 3: identificador externo para deduplicar extratos importados
+    (
+        'ALTER TABLE transacoes ADD COLUMN id_externo TEXT',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_transacoes_id_externo '
+        'ON transacoes (id_externo) WHERE id_externo IS NOT NULL',
+    ),
+    # 4: valores em centavos inteiros (a tabela é reconstruída sem a coluna REAL)
+    (
+        '''CREATE TABLE transacoes_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data TEXT,
+            tipo TEXT,
+            valor_centavos INTEGER NOT NULL DEFAULT 0,
+            descricao TEXT,
+            categoria TEXT,
+            id_externo TEXT
+        )''',
+        '''INSERT INTO transacoes_nova (id, data, tipo, valor_centavos, descricao, categoria, id_externo)
+        SELECT id, data, tipo, CAST(ROUND(COALESCE(valor, 0) * 100) AS INTEGER),
+               descricao, categoria, id_externo
+        FROM transacoes''',
+        '''UPDATE sqlite_sequence
+        SET seq = (SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('transacoes', 'transacoes_nova'))
+        WHERE name = 'transacoes_nova' ''',
+        'DROP TABLE transacoes',
+        'ALTER TABLE transacoes_nova RENAME TO transacoes',
+        'CREATE INDEX idx_transacoes_data ON transacoes (data)',
+        'CREATE INDEX idx_transacoes_tipo_data_categoria '
+        'ON transacoes (tipo, data, categoria, valor_centavos)',
+        'CREATE UNIQUE INDEX idx_transacoes_id_externo '
+        'ON transacoes (id_externo) WHERE id_externo IS NOT NULL',
+        'DROP TABLE totais_mensais',
+        sql_tabela_totais_mensais('INTEGER'),
+        *sql_gatilhos_totais_mensais('valor_centavos'),
+        sql_preencher_totais_mensais('valor_centavos'),
+    ),
+    # 5: busca textual em descrição e categoria
+    sql_indice_busca(),
+    # 6: transações referenciam categorias pelo id (chave estrangeira)
+    (
+        """INSERT OR IGNORE INTO categorias (categoria)
+        SELECT DISTINCT categoria FROM transacoes WHERE categoria IS NOT NULL AND categoria <> ''""",
+        '''CREATE TABLE transacoes_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data TEXT,
+            tipo TEXT,
+            valor_centavos INTEGER NOT NULL DEFAULT 0,
+            descricao TEXT,
+            categoria_id INTEGER REFERENCES categorias (id),
+            id_externo TEXT
+        )''',
+        '''INSERT INTO transacoes_nova (id, data, tipo, valor_centavos, descricao, categoria_id, id_externo)
+        SELECT t.id, t.data, t.tipo, t.valor_centavos, t.descricao, c.id, t.id_externo
+        FROM transacoes t
+        LEFT JOIN categorias c ON c.categoria = t.categoria''',
+        '''UPDATE sqlite_sequence
+        SET seq = (SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('transacoes', 'transacoes_nova'))
+        WHERE name = 'transacoes_nova' ''',
+        'DROP TABLE transacoes_fts',
+        'DROP TABLE transacoes',
+        'ALTER TABLE transacoes_nova RENAME TO transacoes',
+        'CREATE INDEX idx_transacoes_data ON transacoes (data)',
+        'CREATE INDEX idx_transacoes_tipo_data_categoria '
+        'ON transacoes (tipo, data, categoria_id, valor_centavos)',
+        'CREATE INDEX idx_transacoes_categoria ON transacoes (categoria_id)',
+        'CREATE UNIQUE INDEX idx_transacoes_id_externo '
+        'ON transacoes (id_externo) WHERE id_externo IS NOT NULL',
+        # Transações com o nome da categoria, para a tela e para o índice de busca
+        '''CREATE VIEW transacoes_completas AS
+        SELECT t.id, t.data, t.tipo, t.valor_centavos, t.descricao, c.categoria,
+               t.categoria_id, t.id_externo
+        FROM transacoes t
+        LEFT JOIN categorias c ON c.id = t.categoria_id''',
+        'DROP TABLE totais_mensais',
+        sql_tabela_totais_mensais('INTEGER', CATEGORIA_ID),
+        *sql_gatilhos_totais_mensais('valor_centavos', CATEGORIA_ID),
+        sql_preencher_totais_mensais('valor_centavos', CATEGORIA_ID),
+        *sql_indice_busca('transacoes_completas', CATEGORIA_ID),
+        SQL_GATILHO_RENOMEAR_CATEGORIA,
+    ),
+    # 7: regras de transações recorrentes
+    (
+        '''CREATE TABLE recorrencias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            descricao TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            valor_centavos INTEGER NOT NULL,
+            categoria_id INTEGER REFERENCES categorias (id),
+            frequencia TEXT NOT NULL CHECK (frequencia IN ('semanal', 'mensal', 'anual')),
+            inicio TEXT NOT NULL,
+            fim TEXT,
+            materializadas INTEGER NOT NULL DEFAULT 0
+        )''',
+        'CREATE INDEX idx_recorrencias_categoria ON recorrencias (categoria_id)',
+    ),
+    # 8: registro de alterações para exportação incremental
+    (
+        '''CREATE TABLE alteracoes_transacoes (
+            id INTEGER PRIMARY KEY,
+            versao INTEGER NOT NULL,
+            removida INTEGER NOT NULL DEFAULT 0
+        )''',
+        'CREATE INDEX idx_alteracoes_transacoes_versao ON alteracoes_transacoes (versao)',
+        'INSERT INTO alteracoes_transacoes (id, versao) SELECT id, 1 FROM transacoes',
+        # Versão corrente: todas as alterações até a próxima exportação a recebem
+        '''CREATE TABLE versao_alteracoes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL
+        )''',
+        'INSERT INTO versao_alteracoes (id, versao) VALUES (1, 1)',
+        *sql_gatilhos_alteracoes(),
+        '''CREATE TABLE sincronizacoes (
+            destino TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL
+        )''',
+    ),
+]
+
+
+# Linha da tabela de transações; namedtuple não tem __dict__ por instância
+Transacao = namedtuple('Transacao', 'id data tipo valor_centavos descricao categoria')
+
+# Regra de transação recorrente; inicio e fim são datas 'AAAA-MM-DD'
+Recorrencia = namedtuple('Recorrencia', 'id descricao tipo valor_centavos categoria frequencia '
+                                        'inicio fim materializadas')
+
+
+MAXIMO_CENTAVOS = 2 ** 63 - 1
+
+
+def para_centavos(valor):
+    """Converte reais (número ou texto com ',' ou '.' decimal) em centavos inteiros."""
+    try:
+        reais = Decimal(str(valor).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido: {valor!r}") from None
+    if not reais.is_finite():
+        raise ValueError(f"Valor inválido: {valor!r}")
+    try:
+        centavos = int(reais.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100)
+    except InvalidOperation:
+        # Expoentes grandes demais para o contexto do Decimal (1e999999)
+        raise ValueError(f"Valor inválido: {valor!r}") from None
+    # O SQLite guarda inteiros de até 64 bits
+    if abs(centavos) > MAXIMO_CENTAVOS:
+        raise ValueError(f"Valor grande demais: {valor!r}")
+    return centavos
+
+
+def formatar_centavos(centavos):
+    """Formata centavos como reais com duas casas, sem passar por float."""
+    sinal = '-' if centavos < 0 else ''
+    reais, resto = divmod(abs(centavos), 100)
+    return f"{sinal}{reais}.{resto:02d}"
+
+
+def intervalo_mes(mes, ano):
+    """Retorna as datas (início, fim) que delimitam o mês, com fim exclusivo."""
+    inicio = f"{ano:04d}-{mes:02d}-01"
+    if mes == 12:
+        fim = f"{ano + 1:04d}-01-01"
+    else:
+        fim = f"{ano:04d}-{mes + 1:02d}-01"
+    return inicio, fim
+
+
+def inicio_proximo_mes(data):
+    """Primeiro dia (date) do mês seguinte ao de `data`."""
+    return date(data.year + data.month // 12, data.month % 12 + 1, 1)
+
+
+def expressao_busca(texto):
+    """Converte o texto digitado numa consulta FTS5: todos os termos precisam
+    aparecer, cada um como prefixo ("mer" encontra "Mercado").
+    """
+    return ' '.join('"' + termo.replace('"', '""') + '"*' for termo in texto.split())
+
+
+def condicoes_transacoes(mes=None, ano=None, busca=None, categoria=None,
+                         valor_min=None, valor_max=None, busca_esparsa=True):
+    """Monta as condições SQL (e seus parâmetros) dos filtros de transações.
+
+    `busca_esparsa` escolhe o plano da busca textual: partir dos ids
+    encontrados (poucos resultados) ou do índice de data (muitos).
+    """
+    condicoes = []
+    params = []
+    if mes is not None and ano is not None:
+        condicoes.append('data >= ? AND data < ?')
+        params.extend(intervalo_mes(mes, ano))
+    if busca and busca.strip():
+        condicoes.append(SQL_BUSCA_TEXTUAL.format(coluna='id' if busca_esparsa else '+id'))
+        params.append(expressao_busca(busca))
+    if categoria is not None:
+        condicoes.append('categoria_id = (SELECT id FROM categorias WHERE categoria = ?)')
+        params.append(categoria)
+    if valor_min is not None:
+        condicoes.append('valor_centavos >= ?')
+        params.append(valor_min)
+    if valor_max is not None:
+        condicoes.append('valor_centavos <= ?')
+        params.append(valor_max)
+    return condicoes, params
+
+
+class BancoDados:
+    """Camada de acesso a dados com uma única conexão de longa duração."""
+
+    def __init__(self, caminho=None, somente_leitura=False):
+        """Abre (ou cria) o banco e atualiza o esquema. Com `somente_leitura`,
+        o arquivo precisa existir com o esquema atual, e nada é gravado nele."""
+        self.caminho = caminho or CAMINHO_PADRAO
+        self.somente_leitura = somente_leitura
+        self.conn = self._conectar()
+        self.thread_principal = threading.get_ident()
+        # Conexões de leitura das threads de trabalho: todas as abertas e as
+        # ociosas, emprestadas a uma tarefa por vez (ver _conexao)
+        self.local = threading.local()
+        self.conexoes_leitura = []
+        self.conexoes_livres = []
+        self.trava_conexoes = threading.Lock()
+        # Contador de escritas feitas por esta conexão (ver versao_dados)
+        self.alteracoes = 0
+        if somente_leitura:
+            versao = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            if versao != len(MIGRACOES):
+                self.conn.close()
+                raise ValueError(f"{self.caminho}: esquema na versão {versao}, a atual é "
+                                 f"{len(MIGRACOES)}; abra o banco no aplicativo para atualizá-lo")
+        else:
+            self.inicializar()
+
+    def _conectar(self, **opcoes):
+        if self.somente_leitura:
+            # mode=ro: não cria o arquivo se ele não existir
+            caminho = pathname2url(os.path.abspath(self.caminho))
+            conn = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True, cached_statements=256,
+                                   **opcoes)
+        else:
+            conn = sqlite3.connect(self.caminho, cached_statements=256, **opcoes)
+            conn.execute(PRAGMA_WAL)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def fechar(self):
+        with self.trava_conexoes:
+            for conn in self.conexoes_leitura:
+                conn.close()
+            self.conexoes_leitura = []
+            self.conexoes_livres = []
+        if self.conn is not None:
+            if not self.somente_leitura:
+                self.conn.execute('PRAGMA optimize')
+            self.conn.close()
+            self.conn = None
+
+    def versao_dados(self):
+        """Identifica o estado atual dos dados, para invalidar caches.
+
+        Combina as escritas desta conexão com o PRAGMA data_version, que muda
+        quando outra conexão (a importação, outro processo) faz commit.
+        """
+        return self.alteracoes, self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _conexao(self):
+        """Conexão para leituras: a principal na thread que criou o banco, ou uma
+        conexão própria, emprestada até o fim da tarefa (devolver_conexoes), nas
+        threads de trabalho. Com WAL, as leituras dessas threads não bloqueiam
+        nem são bloqueadas pela interface.
+        """
+        if threading.get_ident() == self.thread_principal:
+            return self.conn
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            with self.trava_conexoes:
+                conn = self.conexoes_livres.pop() if self.conexoes_livres else None
+            if conn is None:
+                conn = self._conectar(check_same_thread=False)
+                with self.trava_conexoes:
+                    self.conexoes_leitura.append(conn)
+            self.local.conn = conn
+            if not hasattr(_emprestimos, 'bancos'):
+                _emprestimos.bancos = []
+            _emprestimos.bancos.append(self)
+        return conn
+
+    def _devolver_conexao(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            return
+        self.local.conn = None
+        with self.trava_conexoes:
+            if conn not in self.conexoes_leitura:
+                # O banco foi fechado durante a tarefa
+                return
+            if len(self.conexoes_livres) < MAXIMO_CONEXOES_LIVRES:
+                if conn.in_transaction:
+                    conn.rollback()
+                self.conexoes_livres.append(conn)
+                return
+            self.conexoes_leitura.remove(conn)
+        conn.close()
+
+    def inicializar(self):
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS transacoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data TEXT,
+                    tipo TEXT,
+                    valor REAL,
+                    descricao TEXT,
+                    categoria TEXT
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS categorias (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    categoria TEXT UNIQUE
+                )
+            ''')
+            # Inserir categorias padrão se não existirem. Só grava quando falta
+            # alguma: abrir o banco não disputa a trava de escrita com outro
+            # processo que esteja importando
+            existentes = {row[0] for row in self.conn.execute(SQL_LISTAR_CATEGORIAS)}
+            faltantes = [(categoria,) for categoria in CATEGORIAS_PADRAO
+                         if categoria not in existentes]
+            if faltantes:
+                self.conn.executemany(SQL_GARANTIR_CATEGORIA, faltantes)
+        self.migrar()
+
+    def migrar(self):
+        versao = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        for numero, comandos in enumerate(MIGRACOES[versao:], start=versao + 1):
+            with self.conn:
+                # BEGIN explícito: o sqlite3 não abre transação antes de DDL,
+                # e cada migração precisa ser aplicada por inteiro ou não ser
+                self.conn.execute('BEGIN')
+                for comando in comandos:
+                    self.conn.execute(comando)
+                self.conn.execute(f'PRAGMA user_version = {numero}')
+
+    # Categorias
+
+    @perfil.consulta
+    def listar_categorias(self):
+        return [row[0] for row in self._conexao().execute(SQL_LISTAR_CATEGORIAS)]
+
+    @perfil.consulta
+    def adicionar_categoria(self, categoria):
+        with self.conn:
+            self.conn.execute(SQL_ADICIONAR_CATEGORIA, (categoria,))
+        self.alteracoes += 1
+
+    @perfil.consulta
+    def remover_categoria(self, categoria):
+        """Remove uma categoria sem transações; as que têm devem ser mescladas."""
+        try:
+            with self.conn:
+                self.conn.execute(SQL_REMOVER_CATEGORIA, (categoria,))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"A categoria {categoria!r} tem transações: "
+                             "mescle-a com outra em vez de removê-la") from None
+        self.alteracoes += 1
+
+    @perfil.consulta
+    def renomear_categoria(self, antiga, nova):
+        try:
+            with self.conn:
+                self.conn.execute(SQL_RENOMEAR_CATEGORIA, (nova, antiga))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Já existe a categoria {nova!r}: mescle as duas") from None
+        self.alteracoes += 1
+
+    @perfil.consulta
+    def mesclar_categorias(self, origem, destino):
+        """Passa as transações de `origem` para `destino` e remove `origem`.
+        Retorna o número de transações movidas.
+        """
+        with self.conn:
+            id_origem = self.conn.execute(SQL_ID_CATEGORIA, (origem,)).fetchone()
+            id_destino = self.conn.execute(SQL_ID_CATEGORIA, (destino,)).fetchone()
+            if id_origem is None or id_destino is None:
+                raise ValueError(f"Categoria inexistente: {origem if id_origem is None else destino!r}")
+            movidas = self.conn.execute(SQL_MOVER_CATEGORIA, (id_destino[0], id_origem[0])).rowcount
+            self.conn.execute(SQL_MOVER_CATEGORIA_RECORRENCIAS, (id_destino[0], id_origem[0]))
+            self.conn.execute(SQL_REMOVER_CATEGORIA_ID, id_origem)
+        self.alteracoes += 1
+        return movidas
+
+    # Transações
+
+    @perfil.consulta
+    def adicionar_transacao(self, data, tipo, valor_centavos, descricao, categoria):
+        with self.conn:
+            self.conn.execute(SQL_GARANTIR_CATEGORIA, (categoria,))
+            cursor = self.conn.execute(SQL_ADICIONAR_TRANSACAO,
+                                       (data, tipo, valor_centavos, descricao, categoria))
+        self.alteracoes += 1
+        return cursor.lastrowid
+
+    @perfil.consulta
+    def importar_transacoes(self, transacoes):
+        """Insere em lote, numa única transação, as tuplas
+        (data, tipo, valor_centavos, descricao, categoria, id_externo) do iterável.
+
+        O iterável é consumido sob demanda pelo executemany, então pode ser um
+        gerador lendo um arquivo grande. Linhas cujo id_externo já exista são
+        ignoradas. Retorna (lidas, importadas).
+        """
+        with self.conn:
+            lidas, importadas = self._inserir_lote(transacoes)
+        self.alteracoes += 1
+        return lidas, importadas
+
+    def _inserir_lote(self, transacoes):
+        # Corpo de importar_transacoes, sem abrir transação própria
+        lidas = 0
+        categorias = set()
+        cursor_categorias = self.conn.cursor()
+
+        def acompanhar():
+            nonlocal lidas
+            for transacao in transacoes:
+                lidas += 1
+                # Cada categoria nova é criada antes da primeira transação que a usa
+                if transacao[4] not in categorias:
+                    categorias.add(transacao[4])
+                    cursor_categorias.execute(SQL_GARANTIR_CATEGORIA, (transacao[4],))
+                yield transacao
+
+        importadas = self.conn.executemany(SQL_IMPORTAR_TRANSACAO, acompanhar()).rowcount
+        return lidas, importadas
+
+    @perfil.consulta
+    def remover_transacoes(self, ids):
+        """Remove as transações pela chave primária, numa única transação.
+        Retorna o número de linhas apagadas.
+        """
+        ids = list(ids)
+        removidas = 0
+        with self.conn:
+            for inicio in range(0, len(ids), TAMANHO_LOTE_REMOCAO):
+                lote = ids[inicio:inicio + TAMANHO_LOTE_REMOCAO]
+                sql = SQL_REMOVER_TRANSACOES.format(marcadores=', '.join('?' * len(lote)))
+                removidas += self.conn.execute(sql, lote).rowcount
+        self.alteracoes += 1
+        return removidas
+
+    @perfil.consulta
+    def pagina_transacoes(self, mes=None, ano=None, limite=200, apos=None, **filtro):
+        """Retorna até `limite` transações em ordem decrescente de data.
+
+        `apos` é a chave (data, id) da última linha da página anterior. Os
+        demais filtros (busca, categoria, valor_min, valor_max) são os de
+        condicoes_transacoes.
+        """
+        busca = filtro.get('busca')
+        if busca and busca.strip():
+            filtro['busca_esparsa'] = self.busca_esparsa(busca)
+        condicoes, params = condicoes_transacoes(mes, ano, **filtro)
+        if apos is not None:
+            condicoes.append('(data, id) < (?, ?)')
+            params.extend(apos)
+        filtro = 'WHERE ' + ' AND '.join(condicoes) if condicoes else ''
+        params.append(limite)
+        cursor = self._conexao().cursor()
+        cursor.row_factory = lambda _, linha: Transacao._make(linha)
+        return cursor.execute(SQL_PAGINA_TRANSACOES.format(filtro=filtro), params).fetchall()
+
+    @perfil.consulta
+    def busca_esparsa(self, busca):
+        """Diz se a busca textual encontra poucas transações (ver LIMITE_BUSCA_ESPARSA)."""
+        encontradas = self._conexao().execute(
+            SQL_CONTAR_BUSCA, (expressao_busca(busca), LIMITE_BUSCA_ESPARSA)).fetchone()[0]
+        return encontradas < LIMITE_BUSCA_ESPARSA
+
+    @perfil.consulta
+    def corresponde_filtro(self, id_transacao, mes=None, ano=None, **filtro):
+        """Diz se a transação atende aos filtros (usado ao inserir na tela)."""
+        condicoes, params = condicoes_transacoes(mes, ano, **filtro)
+        if not condicoes:
+            return True
+        sql = SQL_CORRESPONDE_FILTRO.format(condicoes=' AND '.join(condicoes))
+        return self._conexao().execute(sql, (id_transacao, *params)).fetchone() is not None
+
+    @perfil.consulta
+    def saldo(self, mes=None, ano=None, **filtro):
+        """Saldo em centavos do mês, ou de todo o histórico.
+
+        Com filtros de busca, categoria ou valor, soma as transações encontradas.
+        """
+        conn = self._conexao()
+        if condicoes_transacoes(**filtro)[0]:
+            condicoes, params = condicoes_transacoes(mes, ano, **filtro)
+            return conn.execute(SQL_SALDO_FILTRADO.format(filtro='WHERE ' + ' AND '.join(condicoes)),
+                                params).fetchone()[0]
+        if mes is not None and ano is not None:
+            return conn.execute(SQL_SALDO.format(filtro='WHERE ano = ? AND mes = ?'),
+                                (ano, mes)).fetchone()[0]
+        return conn.execute(SQL_SALDO.format(filtro='')).fetchone()[0]
+
+    # Transações recorrentes
+
+    @perfil.consulta
+    def listar_recorrencias(self):
+        cursor = self._conexao().cursor()
+        cursor.row_factory = lambda _, linha: Recorrencia._make(linha)
+        return cursor.execute(SQL_LISTAR_RECORRENCIAS).fetchall()
+
+    @perfil.consulta
+    def adicionar_recorrencia(self, descricao, tipo, valor_centavos, categoria, frequencia,
+                              inicio, fim=None):
+        with self.conn:
+            self.conn.execute(SQL_GARANTIR_CATEGORIA, (categoria,))
+            cursor = self.conn.execute(SQL_ADICIONAR_RECORRENCIA, (
+                descricao, tipo, valor_centavos, categoria, frequencia, inicio, fim))
+        self.alteracoes += 1
+        return cursor.lastrowid
+
+    @perfil.consulta
+    def remover_recorrencia(self, id_recorrencia):
+        """Remove a regra; as transações já lançadas por ela continuam."""
+        with self.conn:
+            self.conn.execute(SQL_REMOVER_RECORRENCIA, (id_recorrencia,))
+        self.alteracoes += 1
+
+    @perfil.consulta
+    def materializar_recorrencias(self, transacoes, materializadas):
+        """Lança as ocorrências devidas e atualiza as contagens das regras,
+        tudo numa única transação.
+
+        `transacoes` segue o formato de importar_transacoes (o id_externo de
+        cada ocorrência impede lançá-la duas vezes); `materializadas` são pares
+        (contagem, id da regra). Retorna o número de transações inseridas.
+        """
+        with self.conn:
+            _, inseridas = self._inserir_lote(transacoes)
+            self.conn.executemany(SQL_ATUALIZAR_MATERIALIZADAS, materializadas)
+        self.alteracoes += 1
+        return inseridas
+
+    # Exportação e sincronização
+
+    def ler_exportacao(self, desde=0, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+        """Lê, num único snapshot, o que mudou depois da versão `desde` (0 = tudo).
+
+        Gera, nesta ordem, ('versao', versão exportada), ('categorias', nomes),
+        ('transacoes', lote de Transacao) e, se `desde` > 0, ('removidas', lote
+        de ids). Os lotes são lidos sob demanda, sem carregar o banco inteiro.
+        Antes da leitura, fecha a versão corrente (uma escrita curta).
+        """
+        conn = self._conexao()
+        with conn:
+            versao = conn.execute(SQL_AVANCAR_VERSAO).fetchone()[0]
+        conn.execute('BEGIN')
+        try:
+            # O que for gravado entre o fechamento e o snapshot já tem a versão
+            # seguinte: fica para a próxima exportação incremental
+            yield 'versao', versao
+            yield 'categorias', [linha[0] for linha in conn.execute(SQL_LISTAR_CATEGORIAS)]
+            cursor = conn.cursor()
+            cursor.row_factory = lambda _, linha: Transacao._make(linha)
+            if desde:
+                cursor.execute(SQL_EXPORTAR_ALTERADAS, (desde, versao))
+            else:
+                cursor.execute(SQL_EXPORTAR_TRANSACOES)
+            while lote := cursor.fetchmany(tamanho_lote):
+                yield 'transacoes', lote
+            if desde:
+                cursor = conn.execute(SQL_REMOVIDAS_DESDE, (desde, versao))
+                while lote := cursor.fetchmany(tamanho_lote):
+                    yield 'removidas', [linha[0] for linha in lote]
+        finally:
+            # Encerra o snapshot (só leitura)
+            conn.rollback()
+
+    @perfil.consulta
+    def aplicar_importacao(self, eventos):
+        """Aplica um backup (ou uma exportação incremental) numa única transação.
+
+        `eventos` gera ('limpar', None), que apaga todas as transações,
+        ('categoria', nome), ('transacao', (id, data, tipo, valor_centavos,
+        descricao, categoria)), gravada pelo id de origem, e ('removida', id).
+        Retorna (gravadas, removidas).
+        """
+        gravadas = removidas = 0
+        categorias = set()
+        with self.conn:
+            for evento, valor in eventos:
+                if evento == 'transacao':
+                    if valor[5] not in categorias:
+                        categorias.add(valor[5])
+                        self.conn.execute(SQL_GARANTIR_CATEGORIA, (valor[5],))
+                    self.conn.execute(SQL_GRAVAR_TRANSACAO, valor)
+                    gravadas += 1
+                elif evento == 'removida':
+                    removidas += self.conn.execute(SQL_REMOVER_TRANSACAO, (valor,)).rowcount
+                elif evento == 'categoria':
+                    categorias.add(valor)
+                    self.conn.execute(SQL_GARANTIR_CATEGORIA, (valor,))
+                elif evento == 'limpar':
+                    self.conn.execute(SQL_LIMPAR_TRANSACOES)
+        self.alteracoes += 1
+        return gravadas, removidas
+
+    def versao_sincronizada(self, destino):
+        """Versão exportada por último para `destino` (0 se nunca foi)."""
+        linha = self._conexao().execute(SQL_VERSAO_SINCRONIZADA, (destino,)).fetchone()
+        return linha[0] if linha else 0
+
+    def registrar_sincronizacao(self, destino, versao):
+        with self.conn:
+            self.conn.execute(SQL_REGISTRAR_SINCRONIZACAO, (destino, versao))
+
+    # Agregações para os gráficos
+
+    @perfil.consulta
+    def despesas_por_categoria(self, mes, ano):
+        """(categoria, total em centavos) das despesas do mês."""
+        return self._conexao().execute(SQL_DESPESAS_CATEGORIA, (ano, mes)).fetchall()
+
+    @perfil.consulta
+    def evolucao_mensal(self, inicio, fim):
+        """Receitas e despesas por mês entre `inicio` e `fim`, tuplas (ano, mes)
+        inclusive. Retorna (ano, mes, receitas, despesas), em centavos, só dos meses
+        com movimento.
+        """
+        return self._conexao().execute(SQL_EVOLUCAO_MENSAL, (*inicio, *fim)).fetchall()
+
+    @perfil.consulta
+    def totais_periodo(self, inicio, fim):
+        """Totais por mês, tipo e categoria de `inicio` a `fim` (date, inclusive).
+
+        Retorna (ano, mes, tipo, categoria, total em centavos), só das
+        combinações com movimento. Os meses inteiros do período vêm de
+        totais_mensais; só os dias dos meses das pontas, quando o período não
+        começa no dia 1 ou não termina no último dia, são lidos das transações.
+        """
+        conn = self._conexao()
+        fim_exclusivo = fim + timedelta(days=1)
+        inicio_meses = inicio if inicio.day == 1 else inicio_proximo_mes(inicio)
+        fim_meses = fim_exclusivo.replace(day=1)
+        linhas = []
+        if inicio_meses < fim_meses:
+            ultimo_mes = fim_meses - timedelta(days=1)
+            linhas += conn.execute(SQL_TOTAIS_MESES, (inicio_meses.year, inicio_meses.month,
+                                                      ultimo_mes.year, ultimo_mes.month))
+            pontas = ((inicio, inicio_meses), (fim_meses, fim_exclusivo))
+        else:
+            # Menos de um mês inteiro: o período todo é ponta
+            pontas = ((inicio, fim_exclusivo),)
+        for de, ate in pontas:
+            if de < ate:
+                linhas += conn.execute(SQL_TOTAIS_DIAS, (de.isoformat(), ate.isoformat()))
+        return linhas
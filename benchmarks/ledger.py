@@ -0,0 +1,90 @@
+"""Gera bancos financas.db sintéticos e reproduzíveis para os benchmarks.
+
+As transações são inseridas por BancoDados.importar_transacoes, com todos os
+gatilhos e índices do esquema atual, então o banco gerado é igual ao que o
+aplicativo produziria:
+
+    python benchmarks/ledger.py 100000 [--saida ledger-100000.db] [--semente 1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from banco import BancoDados, CATEGORIAS_PADRAO  # noqa: E402
+
+ANO_FINAL = 2025
+ANOS = 10
+SEMENTE = 1
+
+CATEGORIAS = CATEGORIAS_PADRAO + ["Saúde", "Educação", "Mercado", "Salário", "Investimentos"]
+
+# (descrição, categoria, tipo, faixa de valor em centavos)
+MODELOS = (
+    ("Supermercado Pão de Açúcar", "Mercado", "Despesa", (3000, 80000)),
+    ("Padaria da esquina", "Alimentação", "Despesa", (500, 4000)),
+    ("Restaurante japonês", "Alimentação", "Despesa", (4000, 25000)),
+    ("Uber viagem", "Transporte", "Despesa", (900, 8000)),
+    ("Posto de gasolina", "Transporte", "Despesa", (5000, 30000)),
+    ("Aluguel apartamento", "Moradia", "Despesa", (150000, 350000)),
+    ("Conta de luz", "Moradia", "Despesa", (8000, 40000)),
+    ("Cinema shopping", "Lazer", "Despesa", (2000, 9000)),
+    ("Farmácia drogaria", "Saúde", "Despesa", (1000, 20000)),
+    ("Mensalidade curso", "Educação", "Despesa", (20000, 90000)),
+    ("Transferência recebida", "Outros", "Receita", (1000, 200000)),
+    ("Salário empresa", "Salário", "Receita", (300000, 1500000)),
+    ("Rendimento aplicação", "Investimentos", "Receita", (100, 50000)),
+)
+
+
+def gerar_transacoes(quantidade, ano_final=ANO_FINAL, anos=ANOS, semente=SEMENTE):
+    """Gera `quantidade` tuplas no formato de importar_transacoes, distribuídas
+    uniformemente pelos `anos` que terminam em `ano_final`.
+    """
+    aleatorio = random.Random(semente)
+    ano_inicial = ano_final - anos + 1
+    for numero in range(quantidade):
+        descricao, categoria, tipo, (minimo, maximo) = aleatorio.choice(MODELOS)
+        data = (f"{aleatorio.randint(ano_inicial, ano_final):04d}-{aleatorio.randint(1, 12):02d}-"
+                f"{aleatorio.randint(1, 28):02d} {aleatorio.randint(0, 23):02d}:"
+                f"{aleatorio.randint(0, 59):02d}:00")
+        yield (data, tipo, aleatorio.randint(minimo, maximo), f"{descricao} {numero}",
+               categoria, None)
+
+
+def gerar_ledger(caminho, quantidade, semente=SEMENTE):
+    """Cria o banco em `caminho` (que não deve existir). Retorna o tempo da
+    importação, em segundos.
+    """
+    if os.path.exists(caminho):
+        raise FileExistsError(caminho)
+    banco = BancoDados(caminho)
+    try:
+        for categoria in CATEGORIAS:
+            if categoria not in CATEGORIAS_PADRAO:
+                banco.adicionar_categoria(categoria)
+        inicio = time.perf_counter()
+        banco.importar_transacoes(gerar_transacoes(quantidade, semente=semente))
+        return time.perf_counter() - inicio
+    finally:
+        banco.fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('quantidade', type=int, help="número de transações")
+    parser.add_argument('--saida', help="arquivo do banco (padrão: ledger-<quantidade>.db)")
+    parser.add_argument('--semente', type=int, default=SEMENTE)
+    args = parser.parse_args(argv)
+
+    caminho = args.saida or f'ledger-{args.quantidade}.db'
+    segundos = gerar_ledger(caminho, args.quantidade, args.semente)
+    print(f"{caminho}: {args.quantidade} transações em {segundos:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
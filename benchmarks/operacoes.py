@@ -0,0 +1,227 @@
+"""Mede as operações mais usadas do EVA CFP em bancos sintéticos de vários tamanhos.
+
+Para cada tamanho, gera (ou reaproveita) um banco com benchmarks/ledger.py,
+trabalha numa cópia dele e mede, com a plataforma Qt 'offscreen' e os
+gráficos desenhados pelo backend Agg:
+
+  carregar_transacoes   -> primeira página de todo o histórico + saldo
+  filtrar_mes           -> troca do mês filtrado na aba Transações
+  rolar_tabela          -> mais 10 páginas da tabela (fetchMore)
+  buscar_comum/raro     -> busca textual até a página e o saldo estarem prontos
+  inserir               -> adicionar_transacao pela janela
+  remover_1/remover_100 -> remoção de linhas selecionadas
+  categorias            -> adicionar e remover uma categoria, atualizando a janela
+  grafico_despesas      -> agregação + desenho do gráfico de pizza do mês
+  grafico_evolucao_1/10 -> agregação + desenho da evolução de 1 e de 10 anos
+  grafico_periodo       -> evolução de um período de ~10 anos que não começa nem
+                           termina em mês inteiro
+  grafico_categorias    -> tendência mensal por categoria em 10 anos
+  grafico_anual         -> comparação de um ano com o anterior
+
+    python benchmarks/operacoes.py [--tamanhos 10000 100000 1000000] [--repeticoes 5]
+        [--pasta ledgers] [--saida relatorio.json] [--comparar relatorio-anterior.json]
+
+O relatório JSON traz mediana e mínimo em milissegundos de cada operação e,
+com --comparar, a variação percentual das medianas em relação a outro relatório.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import ledger  # noqa: E402
+from banco import MIGRACOES  # noqa: E402
+
+TAMANHOS = (10000, 100000, 1000000)
+
+
+def medir(funcao, repeticoes, preparar=None):
+    tempos = []
+    for repeticao in range(repeticoes):
+        if preparar is not None:
+            preparar(repeticao)
+        inicio = time.perf_counter()
+        funcao(repeticao)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {'mediana_ms': round(statistics.median(tempos), 2), 'minimo_ms': round(min(tempos), 2)}
+
+
+def medir_operacoes(caminho, repeticoes):
+    from PySide6.QtWidgets import QApplication
+
+    import eva_cfp
+    from banco import BancoDados
+    from main2 import ControleFinanceiro
+
+    app = QApplication.instance() or QApplication([])
+    janela = ControleFinanceiro(BancoDados(caminho))
+    modelo = janela.modelo_transacoes
+    figura = eva_cfp.nova_figura()
+    ano = ledger.ANO_FINAL
+
+    def esperar_tarefas():
+        janela.executor.aguardar()
+        app.processEvents()
+
+    def buscar(texto):
+        def executar(_):
+            janela.busca_input.setText(texto)
+            janela.aplicar_busca()
+            esperar_tarefas()
+        return executar
+
+    def limpar_busca(_):
+        janela.busca_input.clear()
+        janela.aplicar_busca()
+
+    def rolar(_):
+        for _ in range(10):
+            modelo.fetchMore()
+
+    def inserir(repeticao):
+        janela.tipo_combo.setCurrentIndex(1)
+        janela.valor_input.setText("12,34")
+        janela.descricao_input.setText(f"Benchmark {repeticao}")
+        janela.adicionar_transacao()
+
+    def remover(quantidade):
+        return lambda _: janela.remover_linhas(range(quantidade))
+
+    def categorias(repeticao):
+        janela.banco.adicionar_categoria(f"Benchmark {repeticao}")
+        janela.atualizar_categorias()
+        janela.banco.remover_categoria(f"Benchmark {repeticao}")
+        janela.atualizar_categorias()
+
+    def grafico_despesas(repeticao):
+        dados = eva_cfp.preparar_despesas_categoria(janela.banco, repeticao % 12 + 1, ano)
+        eva_cfp.desenhar_despesas_categoria(figura, dados)
+        figura.canvas.draw()
+
+    def grafico_evolucao(anos):
+        def executar(_):
+            dados = eva_cfp.preparar_evolucao_mensal(janela.banco, ano - anos + 1, ano)
+            eva_cfp.desenhar_evolucao_mensal(figura, dados)
+            figura.canvas.draw()
+        return executar
+
+    def grafico_periodo(preparar, desenhar, inicio, fim):
+        def executar(_):
+            desenhar(figura, preparar(janela.banco, inicio, fim))
+            figura.canvas.draw()
+        return executar
+
+    dez_anos = date(ano - 9, 1, 1), date(ano, 12, 31)
+
+    def recarregar(_):
+        janela.carregar_transacoes()
+
+    try:
+        return {
+            'carregar_transacoes': medir(lambda _: janela.carregar_transacoes(), repeticoes),
+            'filtrar_mes': medir(lambda r: janela.carregar_transacoes(r % 12 + 1, ano), repeticoes),
+            'rolar_tabela': medir(rolar, repeticoes, preparar=recarregar),
+            'buscar_comum': medir(buscar("mer"), repeticoes, preparar=limpar_busca),
+            'buscar_raro': medir(buscar("12345"), repeticoes, preparar=limpar_busca),
+            'inserir': medir(inserir, repeticoes, preparar=limpar_busca),
+            'remover_1': medir(remover(1), repeticoes, preparar=recarregar),
+            'remover_100': medir(remover(100), repeticoes, preparar=recarregar),
+            'categorias': medir(categorias, repeticoes),
+            'grafico_despesas': medir(grafico_despesas, repeticoes),
+            'grafico_evolucao_1': medir(grafico_evolucao(1), repeticoes),
+            'grafico_evolucao_10': medir(grafico_evolucao(10), repeticoes),
+            'grafico_periodo': medir(grafico_periodo(
+                eva_cfp.preparar_evolucao_periodo, eva_cfp.desenhar_evolucao_mensal,
+                date(ano - 9, 3, 15), date(ano, 11, 10)), repeticoes),
+            'grafico_categorias': medir(grafico_periodo(
+                eva_cfp.preparar_tendencia_categorias, eva_cfp.desenhar_tendencia_categorias,
+                *dez_anos), repeticoes),
+            'grafico_anual': medir(grafico_periodo(
+                eva_cfp.preparar_comparacao_anual, eva_cfp.desenhar_comparacao_anual,
+                date(ano, 1, 1), date(ano, 12, 31)), repeticoes),
+        }
+    finally:
+        janela.close()
+
+
+def versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(relatorio, anterior):
+    """Acrescenta a variação percentual de cada mediana em relação ao relatório anterior."""
+    for tamanho, resultado in relatorio['tamanhos'].items():
+        operacoes_anteriores = anterior.get('tamanhos', {}).get(tamanho, {}).get('operacoes', {})
+        for nome, medicao in resultado['operacoes'].items():
+            base = operacoes_anteriores.get(nome, {}).get('mediana_ms')
+            if base:
+                medicao['variacao_pct'] = round(100 * (medicao['mediana_ms'] - base) / base, 1)
+    relatorio['comparado_com'] = anterior.get('versao')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--semente', type=int, default=ledger.SEMENTE)
+    parser.add_argument('--pasta', default=os.path.join(tempfile.gettempdir(), 'eva-cfp-ledgers'),
+                        help="onde guardar os bancos gerados, reaproveitados entre execuções")
+    parser.add_argument('--saida', help="arquivo do relatório JSON (padrão: saída padrão)")
+    parser.add_argument('--comparar', metavar='RELATORIO', help="relatório JSON anterior")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.pasta, exist_ok=True)
+    relatorio = {
+        'versao': versao_codigo(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'repeticoes': args.repeticoes,
+        'tamanhos': {},
+    }
+    for tamanho in args.tamanhos:
+        # O banco gerado depende do esquema: um por versão de migração
+        original = os.path.join(args.pasta, f'ledger-{tamanho}-s{args.semente}-v{len(MIGRACOES)}.db')
+        geracao = None
+        if not os.path.exists(original):
+            print(f"Gerando {original}...", file=sys.stderr)
+            geracao = round(ledger.gerar_ledger(original, tamanho, args.semente), 2)
+        with tempfile.TemporaryDirectory() as pasta:
+            copia = os.path.join(pasta, 'financas.db')
+            shutil.copyfile(original, copia)
+            print(f"Medindo {tamanho} transações...", file=sys.stderr)
+            relatorio['tamanhos'][str(tamanho)] = {
+                'geracao_s': geracao,
+                'operacoes': medir_operacoes(copia, args.repeticoes),
+            }
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar(relatorio, json.load(arquivo))
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
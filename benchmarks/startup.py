@@ -0,0 +1,78 @@
+"""Mede o tempo de importação e de abertura da janela do EVA CFP.
+
+Cada medição roda num processo Python novo (importação a frio), com a
+plataforma Qt 'offscreen' para funcionar sem display:
+
+    python benchmarks/startup.py [--repeticoes 5] [--banco financas.db]
+
+Imprime um JSON com as medianas, em milissegundos, de:
+  importacao  -> import main2
+  janela      -> QApplication + ControleFinanceiro() + show() + eventos pendentes
+  graficos    -> primeira seleção da aba Gráficos (carrega matplotlib)
+e a lista de módulos pesados já carregados antes da aba de gráficos.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS_PESADOS = ('matplotlib', 'numpy', 'pandas')
+
+SCRIPT = r'''
+import json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+import main2
+importado = time.perf_counter()
+from PySide6.QtWidgets import QApplication
+app = QApplication([])
+janela = main2.ControleFinanceiro(main2.BancoDados({banco!r}))
+janela.show()
+app.processEvents()
+aberta = time.perf_counter()
+pesados = [nome for nome in {pesados!r} if nome in sys.modules]
+janela.central_widget.setCurrentIndex(1)
+app.processEvents()
+graficos = time.perf_counter()
+janela.close()
+print(json.dumps({{
+    'importacao': (importado - inicio) * 1000,
+    'janela': (aberta - importado) * 1000,
+    'graficos': (graficos - aberta) * 1000,
+    'pesados_na_abertura': pesados,
+}}))
+'''
+
+
+def medir(banco):
+    codigo = SCRIPT.format(raiz=RAIZ, banco=banco, pesados=MODULOS_PESADOS)
+    ambiente = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    saida = subprocess.run([sys.executable, '-c', codigo], env=ambiente, check=True,
+                           capture_output=True, text=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--banco', help="banco usado na medição (padrão: um banco vazio temporário)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = args.banco or os.path.join(pasta, 'financas.db')
+        medicoes = [medir(banco) for _ in range(args.repeticoes)]
+
+    resultado = {chave: round(statistics.median(m[chave] for m in medicoes), 1)
+                 for chave in ('importacao', 'janela', 'graficos')}
+    resultado['repeticoes'] = args.repeticoes
+    resultado['pesados_na_abertura'] = medicoes[-1]['pesados_na_abertura']
+    print(json.dumps(resultado, indent=2))
+
+
+if __name__ == '__main__':
+    main()
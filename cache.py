@@ -0,0 +1,27 @@
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Cache com descarte do item usado há mais tempo quando passa do limite."""
+
+    def __init__(self, capacidade=64):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+
+    def obter(self, chave):
+        if chave not in self.itens:
+            return None
+        self.itens.move_to_end(chave)
+        return self.itens[chave]
+
+    def guardar(self, chave, valor):
+        self.itens[chave] = valor
+        self.itens.move_to_end(chave)
+        while len(self.itens) > self.capacidade:
+            self.itens.popitem(last=False)
+
+    def limpar(self):
+        self.itens.clear()
+
+    def __len__(self):
+        return len(self.itens)
@@ -0,0 +1,427 @@
+"""Motor de relatórios do EVA CFP, independente da interface gráfica.
+
+Calcula saldos, despesas por categoria e evolução mensal direto do banco e
+desenha os gráficos em qualquer Figure do matplotlib. A interface Qt usa as
+mesmas funções; pela linha de comando, os gráficos são gerados com o backend
+Agg, sem precisar de display:
+
+    python eva_cfp.py financas.db --mes 5 --ano 2025 --grafico-despesas despesas.png
+    python eva_cfp.py *.db --anos 3 --grafico-evolucao "{banco}-evolucao.svg" --json
+    python eva_cfp.py financas.db --grafico-evolucao previsao.png --previsao
+    python eva_cfp.py financas.db --inicio 2023-03-15 --fim 2025-02-10 \
+        --grafico-categorias categorias.png --grafico-anual comparacao.png
+
+Os bancos são abertos só para leitura. Um banco com esquema antigo precisa
+ser aberto antes no aplicativo, ou atualizado aqui com --migrar.
+"""
+import argparse
+import json
+import os
+from datetime import date, datetime
+
+import numpy as np
+
+from analise import MESES_ABREVIADOS, evolucao_mensal, receitas_despesas, series_categorias
+from banco import BancoDados, formatar_centavos
+import perfil
+import recorrencias
+
+MESES = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+         "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+
+# Dados dos gráficos
+
+@perfil.medido
+def preparar_despesas_categoria(banco, mes, ano):
+    linhas = banco.despesas_por_categoria(mes, ano)
+    centavos = np.array([total for _, total in linhas], dtype=np.int64)
+    return {
+        'categorias': [categoria for categoria, _ in linhas],
+        'totais': centavos / 100,
+        'soma': int(centavos.sum()) / 100,
+        'titulo': f'Despesas por Categoria - {MESES[mes - 1]}/{ano}',
+    }
+
+
+def _mes(data):
+    return data.year, data.month
+
+
+def ano_anterior(data):
+    """A mesma data um ano antes (29/02 vira 28/02)."""
+    try:
+        return data.replace(year=data.year - 1)
+    except ValueError:
+        return data.replace(year=data.year - 1, day=28)
+
+
+def titulo_periodo(inicio, fim):
+    if (inicio.month, inicio.day, fim.month, fim.day) == (1, 1, 12, 31):
+        return str(fim.year) if inicio.year == fim.year else f'{inicio.year} a {fim.year}'
+    return f'{inicio:%d/%m/%Y} a {fim:%d/%m/%Y}'
+
+
+def _rotulos_meses(anos, meses, saldos=None):
+    """Posições e rótulos do eixo x de uma série mensal."""
+    if len(meses) <= 12:
+        posicoes = np.arange(len(meses))
+        if saldos is None:
+            return posicoes, [MESES_ABREVIADOS[mes - 1] for mes in meses]
+        # Create custom x-axis labels with month and monthly balance
+        return posicoes, [f'{MESES_ABREVIADOS[mes - 1]}\nR$ {saldo:.0f}'  # Formato sem centavos e sem cor
+                          for mes, saldo in zip(meses, saldos)]
+    # Vários anos: um rótulo por trimestre ou por ano, conforme o tamanho
+    passo = 3 if len(meses) <= 36 else 12
+    posicoes = np.flatnonzero((meses - 1) % passo == 0)
+    return posicoes, [f'{MESES_ABREVIADOS[meses[i] - 1]}/{anos[i] % 100:02d}' for i in posicoes]
+
+
+def preparar_evolucao_mensal(banco, ano_inicio, ano_fim, previsao=False):
+    return preparar_evolucao_periodo(banco, date(ano_inicio, 1, 1), date(ano_fim, 12, 31), previsao)
+
+
+@perfil.medido
+def preparar_evolucao_periodo(banco, inicio, fim, previsao=False):
+    """Série mensal de `inicio` a `fim` (date, inclusive); com `previsao`,
+    inclui as ocorrências das transações recorrentes ainda não lançadas, e os
+    saldos passam a contá-las. A previsão considera os meses das pontas inteiros.
+    """
+    meses_periodo = _mes(inicio), _mes(fim)
+    dados = evolucao_mensal(receitas_despesas(banco.totais_periodo(inicio, fim)), *meses_periodo)
+    previstas = evolucao_mensal(recorrencias.projetar(banco, *meses_periodo) if previsao else [],
+                                *meses_periodo)
+    dados['receitas_previstas'] = previstas['receitas']
+    dados['despesas_previstas'] = previstas['despesas']
+    dados['saldo'] = dados['saldo'] + previstas['saldo']
+    dados['saldo_acumulado'] = dados['saldo_acumulado'] + previstas['saldo_acumulado']
+    # Somas exatas em centavos; reais (float) só para desenhar
+    for chave in ('receitas', 'despesas', 'receitas_previstas', 'despesas_previstas',
+                  'saldo', 'saldo_acumulado'):
+        dados[chave] = dados[chave] / 100
+    dados['titulo'] = f'Evolução Mensal - {titulo_periodo(inicio, fim)}'
+    dados['xticks'] = _rotulos_meses(dados['anos'], dados['meses'], dados['saldo'])
+    return dados
+
+
+@perfil.medido
+def preparar_tendencia_categorias(banco, inicio, fim, tipo='Despesa', maximo=6):
+    """Série mensal das `maximo` categorias de maior total no período; as demais
+    somadas em "Outras"."""
+    meses_periodo = _mes(inicio), _mes(fim)
+    categorias, matriz = series_categorias(banco.totais_periodo(inicio, fim), *meses_periodo, tipo)
+    if len(categorias) > maximo:
+        categorias = categorias[:maximo - 1] + ['Outras']
+        matriz = np.vstack([matriz[:maximo - 1], matriz[maximo - 1:].sum(axis=0)])
+    meses = evolucao_mensal([], *meses_periodo)
+    return {
+        'categorias': [categoria or 'Sem categoria' for categoria in categorias],
+        'series': matriz / 100,
+        'xticks': _rotulos_meses(meses['anos'], meses['meses']),
+        'titulo': f'{tipo}s por Categoria - {titulo_periodo(inicio, fim)}',
+    }
+
+
+@perfil.medido
+def preparar_comparacao_anual(banco, inicio, fim):
+    """Receitas e despesas de cada mês do período ao lado das do mesmo mês um ano antes."""
+    anterior = ano_anterior(inicio), ano_anterior(fim)
+    dados = evolucao_mensal(receitas_despesas(banco.totais_periodo(inicio, fim)),
+                            _mes(inicio), _mes(fim))
+    antes = evolucao_mensal(receitas_despesas(banco.totais_periodo(*anterior)),
+                            _mes(anterior[0]), _mes(anterior[1]))
+    resultado = {
+        'xticks': _rotulos_meses(dados['anos'], dados['meses']),
+        'titulo': f'{titulo_periodo(inicio, fim)} x {titulo_periodo(*anterior)}',
+    }
+    for chave in ('receitas', 'despesas'):
+        atual, passado = int(dados[chave].sum()), int(antes[chave].sum())
+        resultado[chave] = dados[chave] / 100
+        resultado[f'{chave}_ano_anterior'] = antes[chave] / 100
+        resultado[f'variacao_{chave}'] = 100 * (atual - passado) / passado if passado else None
+    return resultado
+
+
+def resumo_mensal(banco, mes, ano):
+    """Totais do mês, saldo geral e despesas por categoria, como dicionário simples.
+
+    Os valores são centavos inteiros (exatos); formatar_relatorio os mostra em reais.
+    """
+    receitas, despesas = _totais_do_mes(banco, mes, ano)
+    return {
+        'mes': mes,
+        'ano': ano,
+        'receitas_centavos': receitas,
+        'despesas_centavos': despesas,
+        'saldo_mes_centavos': banco.saldo(mes, ano),
+        'saldo_geral_centavos': banco.saldo(),
+        'despesas_por_categoria_centavos': dict(banco.despesas_por_categoria(mes, ano)),
+    }
+
+
+def _totais_do_mes(banco, mes, ano):
+    linhas = banco.evolucao_mensal((ano, mes), (ano, mes))
+    if not linhas:
+        return 0, 0
+    return linhas[0][2], linhas[0][3]
+
+
+# Desenho
+
+def desenhar_despesas_categoria(figure, dados):
+    figure.clear()
+    ax = figure.add_subplot(111)
+    if dados['categorias']:
+        soma = dados['soma']
+
+        def func(pct):
+            valor = pct/100.*soma
+            return f'{pct:.1f}%\nR$ {valor:.2f}'
+
+        ax.pie(
+            dados['totais'],
+            labels=dados['categorias'],
+            autopct=func,
+            textprops=dict(color="black", fontsize=10, fontweight='bold'),
+            pctdistance=0.7,
+            labeldistance=1.1
+        )
+        ax.set_title(dados['titulo'])
+    else:
+        ax.text(0.5, 0.5, 'Sem dados para o período selecionado',
+                horizontalalignment='center', verticalalignment='center')
+
+
+def desenhar_evolucao_mensal(figure, dados):
+    receitas = dados['receitas']
+    despesas = dados['despesas']
+    receitas_previstas = dados['receitas_previstas']
+    despesas_previstas = dados['despesas_previstas']
+    previsao = receitas_previstas.any() or despesas_previstas.any()
+    figure.clear()
+    ax = figure.add_subplot(111)
+    if receitas.any() or despesas.any() or previsao:
+        x = np.arange(len(receitas))
+        width = 0.35
+
+        # Plot bars
+        rects1 = ax.bar(x - width/2, receitas, width=width, label='Receitas', color='darkgrey')
+        rects2 = ax.bar(x + width/2, despesas, width=width, label='Despesas', color='lightgrey')
+        if previsao:
+            # Ocorrências previstas, empilhadas sobre o que já foi lançado
+            rects3 = ax.bar(x - width/2, receitas_previstas, width=width, bottom=receitas,
+                            label='Receitas previstas', color='white', edgecolor='darkgrey', hatch='//')
+            rects4 = ax.bar(x + width/2, despesas_previstas, width=width, bottom=despesas,
+                            label='Despesas previstas', color='white', edgecolor='lightgrey', hatch='//')
+
+        # Add value labels on top of bars (omitidos com muitas barras)
+        if len(x) <= 24:
+            def autolabel(rects, values):
+                ax.bar_label(rects, labels=[f'{v:.0f}' if v > 0 else '' for v in values],
+                             padding=3, fontsize=9)
+
+            autolabel(rects1, receitas)
+            autolabel(rects2, despesas)
+            if previsao:
+                autolabel(rects3, receitas_previstas)
+                autolabel(rects4, despesas_previstas)
+
+        posicoes, custom_xticks = dados['xticks']
+        ax.set_title(dados['titulo'])
+        ax.set_xlabel('Mês')
+        ax.set_ylabel('Valor (R$)')
+        ax.set_xticks(posicoes)
+        ax.set_xticklabels(custom_xticks, fontsize=9)
+
+        ax.legend(loc='upper right') # Use upper right as in the image example
+
+        ax.grid(axis='y', linestyle='--', alpha=0.7) # Keep only horizontal grid lines
+        ax.set_ylim(0, max((receitas + receitas_previstas).max(),
+                           (despesas + despesas_previstas).max()) * 1.2) # Adjust y-limit for labels
+
+    else:
+        ax.text(0.5, 0.5, 'Sem dados para o período selecionado',
+                horizontalalignment='center', verticalalignment='center')
+    figure.tight_layout()
+
+
+def desenhar_tendencia_categorias(figure, dados):
+    figure.clear()
+    ax = figure.add_subplot(111)
+    if dados['categorias'] and dados['series'].any():
+        x = np.arange(dados['series'].shape[1])
+        for categoria, serie in zip(dados['categorias'], dados['series']):
+            ax.plot(x, serie, marker='o' if len(x) <= 24 else None, markersize=4, label=categoria)
+        posicoes, rotulos = dados['xticks']
+        ax.set_title(dados['titulo'])
+        ax.set_xlabel('Mês')
+        ax.set_ylabel('Valor (R$)')
+        ax.set_xticks(posicoes)
+        ax.set_xticklabels(rotulos, fontsize=9)
+        ax.legend(loc='upper left', fontsize=9)
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+        ax.set_ylim(bottom=0)
+    else:
+        ax.text(0.5, 0.5, 'Sem dados para o período selecionado',
+                horizontalalignment='center', verticalalignment='center')
+    figure.tight_layout()
+
+
+def desenhar_comparacao_anual(figure, dados):
+    figure.clear()
+    if not any(dados[chave].any() for chave in ('receitas', 'despesas', 'receitas_ano_anterior',
+                                                'despesas_ano_anterior')):
+        ax = figure.add_subplot(111)
+        ax.text(0.5, 0.5, 'Sem dados para o período selecionado',
+                horizontalalignment='center', verticalalignment='center')
+        return
+    figure.suptitle(dados['titulo'])
+    posicoes, rotulos = dados['xticks']
+    width = 0.35
+    for linha, chave in enumerate(('receitas', 'despesas'), start=1):
+        ax = figure.add_subplot(2, 1, linha)
+        x = np.arange(len(dados[chave]))
+        ax.bar(x - width/2, dados[f'{chave}_ano_anterior'], width=width, label='Ano anterior',
+               color='lightgrey')
+        ax.bar(x + width/2, dados[chave], width=width, label='Período', color='darkgrey')
+        variacao = dados[f'variacao_{chave}']
+        titulo = chave.capitalize()
+        if variacao is not None:
+            titulo += f' ({variacao:+.1f}%)'
+        ax.set_title(titulo, fontsize=10)
+        ax.set_ylabel('Valor (R$)')
+        ax.set_xticks(posicoes)
+        ax.set_xticklabels(rotulos, fontsize=9)
+        ax.legend(loc='upper right', fontsize=9)
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+    figure.tight_layout()
+
+
+def nova_figura():
+    """Figure com canvas Agg: não usa pyplot nem backend de interface."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 6))
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def salvar_grafico(figure, caminho):
+    # O formato (png, svg, pdf...) vem da extensão do arquivo
+    figure.savefig(caminho)
+
+
+# Linha de comando
+
+def _caminho_saida(modelo, caminho_banco):
+    return modelo.format(banco=os.path.splitext(os.path.basename(caminho_banco))[0])
+
+
+def gerar_relatorio(caminho_banco, mes, ano, anos=1, grafico_despesas=None, grafico_evolucao=None,
+                    previsao=False, inicio=None, fim=None, grafico_categorias=None,
+                    grafico_anual=None, migrar=False):
+    # Sem período explícito, os gráficos de período cobrem os `anos` até `ano`
+    inicio = inicio or date(ano - anos + 1, 1, 1)
+    fim = fim or date(ano, 12, 31)
+    graficos = (
+        ('grafico_despesas', grafico_despesas, desenhar_despesas_categoria,
+         lambda banco: preparar_despesas_categoria(banco, mes, ano)),
+        ('grafico_evolucao', grafico_evolucao, desenhar_evolucao_mensal,
+         lambda banco: preparar_evolucao_periodo(banco, inicio, fim, previsao)),
+        ('grafico_categorias', grafico_categorias, desenhar_tendencia_categorias,
+         lambda banco: preparar_tendencia_categorias(banco, inicio, fim)),
+        ('grafico_anual', grafico_anual, desenhar_comparacao_anual,
+         lambda banco: preparar_comparacao_anual(banco, inicio, fim)),
+    )
+    banco = BancoDados(caminho_banco, somente_leitura=not migrar)
+    try:
+        relatorio = resumo_mensal(banco, mes, ano)
+        relatorio['banco'] = caminho_banco
+        figure = None
+        for chave, modelo, desenhar, preparar in graficos:
+            if modelo:
+                figure = figure or nova_figura()
+                desenhar(figure, preparar(banco))
+                relatorio[chave] = _caminho_saida(modelo, caminho_banco)
+                salvar_grafico(figure, relatorio[chave])
+        return relatorio
+    finally:
+        banco.fechar()
+
+
+def formatar_relatorio(relatorio):
+    linhas = [
+        f"{relatorio['banco']} - {MESES[relatorio['mes'] - 1]}/{relatorio['ano']}",
+        f"  Receitas: R$ {formatar_centavos(relatorio['receitas_centavos'])}",
+        f"  Despesas: R$ {formatar_centavos(relatorio['despesas_centavos'])}",
+        f"  Saldo do mês: R$ {formatar_centavos(relatorio['saldo_mes_centavos'])}",
+        f"  Saldo geral: R$ {formatar_centavos(relatorio['saldo_geral_centavos'])}",
+    ]
+    categorias = relatorio['despesas_por_categoria_centavos']
+    despesas = relatorio['despesas_centavos']
+    if categorias:
+        linhas.append("  Despesas por categoria:")
+        largura = max(len(categoria) for categoria in categorias)
+        for categoria, total in sorted(categorias.items(), key=lambda item: -item[1]):
+            pct = 100 * total / despesas if despesas else 0
+            linhas.append(f"    {categoria:<{largura}}  R$ {formatar_centavos(total):>10}  ({pct:.1f}%)")
+    for chave in ('grafico_despesas', 'grafico_evolucao', 'grafico_categorias', 'grafico_anual'):
+        if chave in relatorio:
+            linhas.append(f"  Gráfico: {relatorio[chave]}")
+    return '\n'.join(linhas)
+
+
+def main(argv=None):
+    agora = datetime.now()
+    parser = argparse.ArgumentParser(description="Relatórios do EVA CFP sem interface gráfica.")
+    parser.add_argument('bancos', nargs='*', default=['financas.db'],
+                        help="bancos SQLite a processar (padrão: financas.db)")
+    parser.add_argument('--mes', type=int, choices=range(1, 13), default=agora.month)
+    parser.add_argument('--ano', type=int, default=agora.year)
+    parser.add_argument('--anos', type=int, default=1,
+                        help="anos da evolução mensal, terminando em --ano")
+    parser.add_argument('--grafico-despesas', metavar='ARQUIVO',
+                        help="salva o gráfico de despesas (.png, .svg...); {banco} vira o nome do banco")
+    parser.add_argument('--grafico-evolucao', metavar='ARQUIVO',
+                        help="salva o gráfico de evolução mensal; {banco} vira o nome do banco")
+    parser.add_argument('--grafico-categorias', metavar='ARQUIVO',
+                        help="salva a tendência mensal das despesas por categoria no período")
+    parser.add_argument('--grafico-anual', metavar='ARQUIVO',
+                        help="salva a comparação do período com o mesmo período do ano anterior")
+    parser.add_argument('--inicio', type=date.fromisoformat, metavar='AAAA-MM-DD',
+                        help="início do período dos gráficos (padrão: janeiro do primeiro dos --anos)")
+    parser.add_argument('--fim', type=date.fromisoformat, metavar='AAAA-MM-DD',
+                        help="fim do período dos gráficos (padrão: dezembro de --ano)")
+    parser.add_argument('--previsao', action='store_true',
+                        help="inclui na evolução mensal as transações recorrentes ainda não lançadas")
+    parser.add_argument('--json', action='store_true', help="imprime o relatório em JSON")
+    parser.add_argument('--migrar', action='store_true',
+                        help="atualiza o esquema de bancos antigos (o relatório não grava nada sem isso)")
+    args = parser.parse_args(argv)
+
+    for caminho in args.bancos:
+        if not os.path.isfile(caminho):
+            parser.error(f"banco não encontrado: {caminho}")
+    # Os mesmos padrões de gerar_relatorio, para validar o período já completo
+    inicio = args.inicio or date(args.ano - args.anos + 1, 1, 1)
+    fim = args.fim or date(args.ano, 12, 31)
+    if inicio > fim:
+        parser.error(f"período inválido: início {inicio:%d/%m/%Y} depois do fim {fim:%d/%m/%Y}")
+    try:
+        relatorios = [gerar_relatorio(caminho, args.mes, args.ano, args.anos,
+                                      args.grafico_despesas, args.grafico_evolucao, args.previsao,
+                                      inicio, fim, args.grafico_categorias,
+                                      args.grafico_anual, args.migrar)
+                      for caminho in args.bancos]
+    except ValueError as erro:
+        # Esquema desatualizado (ver BancoDados com somente_leitura)
+        parser.error(str(erro))
+    if args.json:
+        print(json.dumps(relatorios, ensure_ascii=False, indent=2))
+    else:
+        print('\n\n'.join(formatar_relatorio(relatorio) for relatorio in relatorios))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Aba de gráficos do EVA CFP, importada sob demanda por main2.ControleFinanceiro."""
+from datetime import date, datetime
+
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                               QComboBox, QMessageBox, QSpinBox, QCheckBox, QDateEdit)
+from PySide6.QtCore import QDate
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+from tarefas import ExecutorTarefas
+from cache import CacheLRU
+import eva_cfp
+import perfil
+
+class GraficosWidget(QWidget):
+    def __init__(self, banco, parent=None):
+        super().__init__(parent)
+        self.banco = banco
+        # Consultas e preparação dos gráficos rodam fora da thread da interface
+        self.executor = ExecutorTarefas(self)
+        # Resultados preparados por (gráfico, mês, ano, versão dos dados)
+        self.cache = CacheLRU(64)
+        # Figuras já desenhadas e a imagem de cada uma, pela mesma chave: rever um
+        # período só copia a imagem para o canvas. Cada imagem ocupa alguns MB
+        # (largura x altura x 4 bytes), então guardam-se menos que os dados
+        self.renderizados = CacheLRU(16)
+        self.grafico_exibido = None
+        layout = QVBoxLayout(self)
+        
+        # Filtro de mês
+        filtro_layout = QHBoxLayout()
+        self.mes_combo = QComboBox()
+        meses = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+                "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+        self.mes_combo.addItems(meses)
+        self.mes_combo.currentIndexChanged.connect(self.atualizar_graficos)
+        filtro_layout.addWidget(QLabel("Mês:"))
+        filtro_layout.addWidget(self.mes_combo)
+        
+        self.ano_spin = QSpinBox()
+        self.ano_spin.setRange(2000, 2100)
+        self.ano_spin.setValue(datetime.now().year)
+        self.ano_spin.valueChanged.connect(self.atualizar_graficos)
+        filtro_layout.addWidget(QLabel("Ano:"))
+        filtro_layout.addWidget(self.ano_spin)
+        
+        # Quantidade de anos (terminando em ano_spin) da evolução mensal
+        self.anos_spin = QSpinBox()
+        self.anos_spin.setRange(1, 10)
+        self.anos_spin.valueChanged.connect(self.atualizar_graficos)
+        filtro_layout.addWidget(QLabel("Anos:"))
+        filtro_layout.addWidget(self.anos_spin)
+        
+        # Evolução mensal com as transações recorrentes ainda não lançadas
+        self.previsao_check = QCheckBox("Previsão")
+        self.previsao_check.toggled.connect(self.atualizar_graficos)
+        filtro_layout.addWidget(self.previsao_check)
+        
+        # Período da evolução, da tendência por categoria e da comparação anual
+        periodo_layout = QHBoxLayout()
+        self.periodo_combo = QComboBox()
+        self.periodo_combo.addItems(["Anos selecionados", "Últimos 12 meses", "Personalizado"])
+        self.periodo_combo.currentIndexChanged.connect(self.alterar_periodo)
+        periodo_layout.addWidget(QLabel("Período:"))
+        periodo_layout.addWidget(self.periodo_combo)
+        hoje = QDate.currentDate()
+        self.inicio_edit = QDateEdit(QDate(hoje.year(), 1, 1))
+        self.fim_edit = QDateEdit(hoje)
+        for edit, rotulo in ((self.inicio_edit, "De:"), (self.fim_edit, "Até:")):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("dd/MM/yyyy")
+            edit.setEnabled(False)
+            edit.dateChanged.connect(self.atualizar_graficos)
+            periodo_layout.addWidget(QLabel(rotulo))
+            periodo_layout.addWidget(edit)
+        periodo_layout.addStretch()
+        
+        # Botões para diferentes tipos de gráficos
+        btn_layout = QHBoxLayout()
+        self.btn_despesas = QPushButton("Despesas por Categoria")
+        self.btn_despesas.clicked.connect(self.plotar_despesas_categoria)
+        btn_layout.addWidget(self.btn_despesas)
+        
+        self.btn_evolucao = QPushButton("Evolução Mensal")
+        self.btn_evolucao.clicked.connect(self.plotar_evolucao_mensal)
+        btn_layout.addWidget(self.btn_evolucao)
+        
+        self.btn_categorias = QPushButton("Tendência por Categoria")
+        self.btn_categorias.clicked.connect(self.plotar_tendencia_categorias)
+        btn_layout.addWidget(self.btn_categorias)
+        
+        self.btn_anual = QPushButton("Comparação Anual")
+        self.btn_anual.clicked.connect(self.plotar_comparacao_anual)
+        btn_layout.addWidget(self.btn_anual)
+        
+        layout.addLayout(filtro_layout)
+        layout.addLayout(periodo_layout)
+        layout.addLayout(btn_layout)
+        
+        # Criar figura do matplotlib
+        self.figure = Figure(figsize=(8, 6))
+        self.canvas = FigureCanvas(self.figure)
+        layout.addWidget(self.canvas)
+        
+    def atualizar_graficos(self):
+        if hasattr(self, 'ultimo_grafico'):
+            if self.ultimo_grafico == 'despesas':
+                self.plotar_despesas_categoria()
+            elif self.ultimo_grafico == 'evolucao':
+                self.plotar_evolucao_mensal()
+            elif self.ultimo_grafico == 'categorias':
+                self.plotar_tendencia_categorias()
+            elif self.ultimo_grafico == 'anual':
+                self.plotar_comparacao_anual()
+
+    def alterar_periodo(self, indice):
+        personalizado = indice == 2
+        self.inicio_edit.setEnabled(personalizado)
+        self.fim_edit.setEnabled(personalizado)
+        self.atualizar_graficos()
+
+    def periodo(self):
+        """(início, fim), em date e inclusive, dos gráficos de período."""
+        indice = self.periodo_combo.currentIndex()
+        if indice == 1:
+            # Os 12 meses que terminam no atual, até hoje
+            hoje = date.today()
+            ano, mes = divmod(hoje.year * 12 + hoje.month - 12, 12)
+            return date(ano, mes + 1, 1), hoje
+        if indice == 2:
+            datas = self.inicio_edit.date().toPython(), self.fim_edit.date().toPython()
+            return min(datas), max(datas)
+        ano = self.ano_spin.value()
+        return date(ano - self.anos_spin.value() + 1, 1, 1), date(ano, 12, 31)
+        
+    def plotar_despesas_categoria(self):
+        self.ultimo_grafico = 'despesas'
+        mes = self.mes_combo.currentIndex() + 1
+        ano = self.ano_spin.value()
+        self.plotar(('despesas', mes, ano, self.banco.versao_dados()),
+                    eva_cfp.preparar_despesas_categoria, (self.banco, mes, ano),
+                    self.desenhar_despesas_categoria)
+
+    def plotar(self, chave, preparar, args, desenhar):
+        if chave == self.grafico_exibido:
+            # O canvas já mostra exatamente este gráfico
+            self.executor.cancelar('grafico')
+            return
+        dados = self.cache.obter(chave)
+        if dados is not None:
+            self.executor.cancelar('grafico')
+            self.exibir(chave, dados, desenhar)
+            return
+        # Uma nova troca de mês/ano cancela a preparação anterior ainda pendente
+        self.executor.executar('grafico', preparar, *args,
+                               ao_concluir=lambda dados: self.exibir(chave, dados, desenhar),
+                               ao_falhar=self.falha_grafico)
+
+    def exibir(self, chave, dados, desenhar):
+        self.cache.guardar(chave, dados)
+        renderizado = self.renderizados.obter(chave)
+        if renderizado is not None and renderizado[0].dpi == self.figure.dpi:
+            figura, imagem, tamanho = renderizado
+            self.usar_figura(figura)
+            if tamanho == self.tamanho_canvas():
+                self.canvas.restore_region(imagem)
+                self.canvas.update()
+            else:
+                # A janela mudou de tamanho: redesenha, mas sem refazer o gráfico
+                self.canvas.draw()
+        else:
+            self.usar_figura(Figure(figsize=self.figure.get_size_inches(), dpi=self.figure.dpi))
+            desenhar(dados)
+        self.renderizados.guardar(chave, (self.figure, self.canvas.copy_from_bbox(self.figure.bbox),
+                                          self.tamanho_canvas()))
+        self.grafico_exibido = chave
+
+    def usar_figura(self, figura):
+        # O tamanho da figura acompanha o do canvas (ver FigureCanvasQT.resizeEvent)
+        figura.set_size_inches(self.figure.get_size_inches(), forward=False)
+        figura.set_canvas(self.canvas)
+        self.canvas.figure = figura
+        self.figure = figura
+
+    def tamanho_canvas(self):
+        return (*self.canvas.get_width_height(physical=True), self.figure.dpi)
+
+    @perfil.medido
+    def desenhar_despesas_categoria(self, dados):
+        eva_cfp.desenhar_despesas_categoria(self.figure, dados)
+        self.canvas.draw()
+        
+    def plotar_evolucao_mensal(self):
+        self.ultimo_grafico = 'evolucao'
+        inicio, fim = self.periodo()
+        previsao = self.previsao_check.isChecked()
+        # A previsão depende do dia: o que já venceu deixa de ser previsto
+        self.plotar(('evolucao', inicio, fim, previsao and date.today(), self.banco.versao_dados()),
+                    eva_cfp.preparar_evolucao_periodo, (self.banco, inicio, fim, previsao),
+                    self.desenhar_evolucao_mensal)
+
+    @perfil.medido
+    def desenhar_evolucao_mensal(self, dados):
+        eva_cfp.desenhar_evolucao_mensal(self.figure, dados)
+        self.canvas.draw()
+
+    def plotar_tendencia_categorias(self):
+        self.ultimo_grafico = 'categorias'
+        inicio, fim = self.periodo()
+        self.plotar(('categorias', inicio, fim, self.banco.versao_dados()),
+                    eva_cfp.preparar_tendencia_categorias, (self.banco, inicio, fim),
+                    self.desenhar_tendencia_categorias)
+
+    @perfil.medido
+    def desenhar_tendencia_categorias(self, dados):
+        eva_cfp.desenhar_tendencia_categorias(self.figure, dados)
+        self.canvas.draw()
+
+    def plotar_comparacao_anual(self):
+        self.ultimo_grafico = 'anual'
+        inicio, fim = self.periodo()
+        self.plotar(('anual', inicio, fim, self.banco.versao_dados()),
+                    eva_cfp.preparar_comparacao_anual, (self.banco, inicio, fim),
+                    self.desenhar_comparacao_anual)
+
+    @perfil.medido
+    def desenhar_comparacao_anual(self, dados):
+        eva_cfp.desenhar_comparacao_anual(self.figure, dados)
+        self.canvas.draw()
+
+    def falha_grafico(self, mensagem):
+        QMessageBox.warning(self, "Erro", f"Não foi possível gerar o gráfico:\n{mensagem}")
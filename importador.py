@@ -0,0 +1,193 @@
+"""Importação de extratos bancários (CSV e OFX) para o banco do EVA CFP.
+
+Uso pela linha de comando:
+
+    python importador.py extrato.csv [--banco financas.db] [--categoria Outros]
+    python importador.py extrato.ofx
+"""
+import argparse
+import csv
+import hashlib
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+
+from banco import BancoDados, para_centavos
+
+CATEGORIA_PADRAO = "Outros"
+
+# Nomes de coluna reconhecidos automaticamente em arquivos CSV
+ALIASES_COLUNAS = {
+    'data': ('data', 'date', 'dt', 'data lançamento', 'data lancamento'),
+    'tipo': ('tipo', 'type'),
+    'valor': ('valor', 'value', 'amount', 'quantia'),
+    'descricao': ('descricao', 'descrição', 'description', 'historico', 'histórico', 'memo'),
+    'categoria': ('categoria', 'category'),
+}
+
+FORMATOS_DATA = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y")
+
+TAG_OFX = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+@lru_cache(maxsize=4096)
+def converter_data(texto):
+    # Extratos repetem muito as mesmas datas; o cache evita o strptime por linha
+    texto = texto.strip()
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    raise ValueError(f"Data inválida: {texto!r}")
+
+
+def converter_valor(texto):
+    """Converte o valor do extrato em centavos inteiros.
+
+    Aceita 1.234,56 e 1,234.56: o separador que aparece por último é o decimal
+    e o outro é o de milhar; um separador repetido (1.234.567) é de milhar.
+    """
+    texto = texto.strip().replace('R$', '').replace(' ', '')
+    decimal = ',' if texto.rfind(',') > texto.rfind('.') else '.'
+    milhar = '.' if decimal == ',' else ','
+    if texto.count(decimal) > 1:
+        if milhar in texto:
+            raise ValueError(f"Valor inválido: {texto!r}")
+        milhar = decimal
+    # para_centavos aceita a vírgula decimal
+    return para_centavos(texto.replace(milhar, ''))
+
+
+def converter_tipo(texto, valor):
+    """Usa a coluna de tipo se houver; senão, o sinal do valor define o tipo."""
+    texto = (texto or '').strip().lower()
+    if texto.startswith(('rec', 'cred', 'entrada', 'income')):
+        return "Receita"
+    if texto.startswith(('desp', 'deb', 'saida', 'saída', 'expense')):
+        return "Despesa"
+    return "Despesa" if valor < 0 else "Receita"
+
+
+def _chave_externa(origem, *campos):
+    return hashlib.sha1('\x1f'.join([origem, *map(str, campos)]).encode('utf-8')).hexdigest()
+
+
+def _mapear_colunas(cabecalho, mapeamento):
+    normalizado = {nome.strip().lower(): i for i, nome in enumerate(cabecalho)}
+    indices = {}
+    for campo, aliases in ALIASES_COLUNAS.items():
+        if campo in mapeamento:
+            aliases = (mapeamento[campo].strip().lower(),)
+        for alias in aliases:
+            if alias in normalizado:
+                indices[campo] = normalizado[alias]
+                break
+    faltando = {'data', 'valor'} - indices.keys()
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias não encontradas: {', '.join(sorted(faltando))}")
+    return indices
+
+
+def ler_csv(caminho, mapeamento=None, categoria_padrao=CATEGORIA_PADRAO):
+    """Gera as transações de um CSV, linha a linha, sem carregar o arquivo todo.
+
+    Cada transação é (data, tipo, valor_centavos, descricao, categoria, id_externo). O
+    id_externo é derivado dos campos e do número da ocorrência de linhas
+    idênticas no arquivo, para que reimportar o mesmo extrato não duplique nada.
+    """
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.reader(arquivo, dialeto)
+        indices = _mapear_colunas(next(leitor), mapeamento or {})
+        ocorrencias = {}
+        for linha in leitor:
+            if not any(linha):
+                continue
+            valor = converter_valor(linha[indices['valor']])
+            data = converter_data(linha[indices['data']])
+            tipo = converter_tipo(linha[indices['tipo']] if 'tipo' in indices else None, valor)
+            descricao = linha[indices['descricao']].strip() if 'descricao' in indices else ''
+            categoria = (linha[indices['categoria']].strip() if 'categoria' in indices else '') \
+                or categoria_padrao
+            # Valor em reais na chave, para manter os ids de importações anteriores
+            chave = (data, tipo, abs(valor) / 100, descricao, categoria)
+            ocorrencias[chave] = ocorrencias.get(chave, 0) + 1
+            yield (data, tipo, abs(valor), descricao, categoria,
+                   _chave_externa('csv', *chave, ocorrencias[chave]))
+
+
+def ler_ofx(caminho, categoria_padrao=CATEGORIA_PADRAO):
+    """Gera as transações de um extrato OFX (SGML ou XML), bloco a bloco."""
+    with open(caminho, encoding='latin-1') as arquivo:
+        campos = None
+        conta = ''
+        for linha in arquivo:
+            for tag, conteudo in TAG_OFX.findall(linha):
+                tag = tag.upper()
+                conteudo = conteudo.strip()
+                if tag == 'ACCTID':
+                    conta = conteudo
+                elif tag == 'STMTTRN':
+                    campos = {}
+                elif campos is not None and conteudo:
+                    campos[tag] = conteudo
+            if campos is not None and '</STMTTRN>' in linha.upper():
+                valor = converter_valor(campos['TRNAMT'])
+                data = datetime.strptime(campos['DTPOSTED'][:8], "%Y%m%d").strftime("%Y-%m-%d %H:%M:%S")
+                tipo = converter_tipo(campos.get('TRNTYPE'), valor)
+                descricao = campos.get('MEMO') or campos.get('NAME', '')
+                id_externo = campos.get('FITID') or _chave_externa('ofx', data, valor / 100, descricao)
+                yield (data, tipo, abs(valor), descricao, categoria_padrao,
+                       _chave_externa('ofx', conta, id_externo))
+                campos = None
+
+
+def ler_extrato(caminho, formato=None, **opcoes):
+    formato = formato or os.path.splitext(caminho)[1].lstrip('.').lower()
+    if formato == 'ofx':
+        opcoes.pop('mapeamento', None)
+        return ler_ofx(caminho, **opcoes)
+    if formato in ('csv', 'txt'):
+        return ler_csv(caminho, **opcoes)
+    raise ValueError(f"Formato de extrato não suportado: {formato!r}")
+
+
+def importar_extrato(banco, caminho, formato=None, **opcoes):
+    """Importa o extrato numa única transação. Retorna (lidas, importadas)."""
+    return banco.importar_transacoes(ler_extrato(caminho, formato, **opcoes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa extratos CSV/OFX para o EVA CFP.")
+    parser.add_argument('arquivos', nargs='+', help="arquivos de extrato (.csv ou .ofx)")
+    parser.add_argument('--banco', help="caminho do banco SQLite (padrão: financas.db)")
+    parser.add_argument('--formato', choices=('csv', 'ofx'), help="força o formato do arquivo")
+    parser.add_argument('--categoria', default=CATEGORIA_PADRAO,
+                        help="categoria usada quando o extrato não informa uma")
+    parser.add_argument('--coluna', action='append', default=[], metavar='CAMPO=COLUNA',
+                        help="mapeia um campo (data, tipo, valor, descricao, categoria) "
+                             "para uma coluna do CSV")
+    args = parser.parse_args(argv)
+
+    mapeamento = dict(item.split('=', 1) for item in args.coluna)
+    banco = BancoDados(args.banco)
+    try:
+        for caminho in args.arquivos:
+            opcoes = {'categoria_padrao': args.categoria}
+            if mapeamento:
+                opcoes['mapeamento'] = mapeamento
+            lidas, importadas = importar_extrato(banco, caminho, args.formato, **opcoes)
+            print(f"{caminho}: {lidas} transações lidas, {importadas} importadas")
+    finally:
+        banco.fechar()
+
+
+if __name__ == '__main__':
+    main()
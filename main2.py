@@ -1,20 +1,238 @@
+import os
+import sqlite3
 import sys
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                            QHBoxLayout, QPushButton, QLabel, QLineEdit,
                            QComboBox, QTableWidget, QTableWidgetItem, QMessageBox,
-                           QTabWidget, QDialog, QCalendarWidget, QSpinBox)
-from PySide6.QtCore import Qt, QDate
-import sqlite3
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import pandas as pd
-import numpy as np
+                           QTabWidget, QDialog, QCalendarWidget, QSpinBox, QTableView,
+                           QHeaderView, QFileDialog, QCheckBox, QInputDialog, QDateEdit)
+from PySide6.QtGui import QAction, QKeySequence, QShortcut
+from PySide6.QtCore import Qt, QDate, QAbstractTableModel, QModelIndex, QTimer
+from datetime import date, datetime
+from banco import BancoDados, Transacao, formatar_centavos, intervalo_mes, para_centavos
+from importador import importar_extrato
+import sincronizacao
+from tarefas import ExecutorTarefas
+import perfil
+import recorrencias
+
+class TransacoesModel(QAbstractTableModel):
+    """Modelo da tabela de transações, carregado sob demanda em páginas.
+
+    Guarda apenas as tuplas vindas do banco; a formatação de cada célula é
+    feita em data(), somente para as células que a view efetivamente exibe.
+    """
+    COLUNAS = ["Data", "Tipo", "Valor", "Descrição", "Categoria"]
+    TAMANHO_PAGINA = 200
+
+    def __init__(self, banco, parent=None):
+        super().__init__(parent)
+        self.banco = banco
+        self.linhas = []
+        self.mes = None
+        self.ano = None
+        # Filtros da busca (busca, categoria, valor_min, valor_max)
+        self.filtro = {}
+        self.completo = False
+
+    def carregar(self, mes=None, ano=None, **filtro):
+        self.beginResetModel()
+        self.mes = mes
+        self.ano = ano
+        self.filtro = filtro
+        self.linhas = []
+        self.completo = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def transacao(self, row):
+        # Transacao(id, data, tipo, valor_centavos, descricao, categoria)
+        return self.linhas[row]
+
+    def pertence_ao_filtro(self, transacao):
+        if self.filtro:
+            # A busca textual segue as regras do índice FTS: quem decide é o banco
+            return self.banco.corresponde_filtro(transacao.id, self.mes, self.ano, **self.filtro)
+        if self.mes is None or self.ano is None:
+            return True
+        inicio, fim = intervalo_mes(self.mes, self.ano)
+        return inicio <= transacao.data < fim
+
+    def _posicao(self, chave):
+        # Busca binária pela posição de (data, id) nas linhas em ordem decrescente
+        inicio, fim = 0, len(self.linhas)
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            linha = self.linhas[meio]
+            if (linha.data, linha.id) > chave:
+                inicio = meio + 1
+            else:
+                fim = meio
+        return inicio
+
+    def inserir(self, transacao):
+        """Insere uma transação recém-criada na posição correta, sem recarregar.
+
+        Se ela cair depois da última página já carregada, não é inserida agora:
+        virá naturalmente no próximo fetchMore.
+        """
+        row = self._posicao((transacao.data, transacao.id))
+        if row == len(self.linhas) and not self.completo:
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.linhas.insert(row, transacao)
+        self.endInsertRows()
+
+    def remover(self, rows):
+        # De baixo para cima, agrupando linhas consecutivas num único aviso à view
+        rows = sorted(set(rows), reverse=True)
+        while rows:
+            fim = inicio = rows.pop(0)
+            while rows and rows[0] == inicio - 1:
+                inicio = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), inicio, fim)
+            del self.linhas[inicio:fim + 1]
+            self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.linhas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUNAS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        valor = self.linhas[index.row()][index.column() + 1]
+        if index.column() == 2:  # Coluna de valor, em centavos
+            return f"R$ {formatar_centavos(valor)}"
+        return str(valor)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUNAS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.completo
+
+    @perfil.medido
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.completo:
+            return
+        apos = None
+        if self.linhas:
+            ultima = self.linhas[-1]
+            apos = (ultima.data, ultima.id)
+        novas = self.banco.pagina_transacoes(self.mes, self.ano, self.TAMANHO_PAGINA, apos,
+                                             **self.filtro)
+        if len(novas) < self.TAMANHO_PAGINA:
+            self.completo = True
+        if novas:
+            inicio = len(self.linhas)
+            self.beginInsertRows(QModelIndex(), inicio, inicio + len(novas) - 1)
+            self.linhas.extend(novas)
+            self.endInsertRows()
+
+# Filtros do diálogo de exportação: (filtro, formato, extensão)
+FORMATOS_BACKUP = (
+    ("JSON do aplicativo web (*.json)", 'json', '.json'),
+    ("Colunar compacto (*.cfp.gz)", 'colunar', '.cfp.gz'),
+)
+
+BANCO_OCUPADO = ("O banco de dados está ocupado por outra gravação (uma importação, "
+                 "por exemplo). Tente novamente em instantes.")
+
+def importar_extrato_isolado(caminho_banco, caminho_extrato):
+    # Roda numa thread de trabalho, então usa uma conexão própria para escrever
+    banco = BancoDados(caminho_banco)
+    try:
+        return importar_extrato(banco, caminho_extrato)
+    finally:
+        banco.fechar()
+
+def importar_backup_isolado(caminho_banco, caminho_backup):
+    banco = BancoDados(caminho_banco)
+    try:
+        return sincronizacao.importar(banco, caminho_backup)
+    finally:
+        banco.fechar()
+
+class PainelPerfil(QDialog):
+    """Últimos registros de tempo (ver perfil.py), atualizados enquanto o painel está aberto."""
+    COLUNAS = ["Hora", "Tipo", "Operação", "ms", "Linhas", "Thread", "SQL"]
+    MAXIMO_LINHAS = 500
 
-class GerenciarCategoriasDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.setWindowTitle("Painel de desempenho")
+        self.setGeometry(150, 150, 900, 500)
+        self.exibidos = None
+        
+        layout = QVBoxLayout(self)
+        self.tabela = QTableWidget()
+        self.tabela.setColumnCount(len(self.COLUNAS))
+        self.tabela.setHorizontalHeaderLabels(self.COLUNAS)
+        self.tabela.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.tabela)
+        
+        botoes_layout = QHBoxLayout()
+        self.label_estado = QLabel()
+        botoes_layout.addWidget(self.label_estado)
+        btn_limpar = QPushButton("Limpar")
+        btn_limpar.clicked.connect(self.limpar)
+        botoes_layout.addWidget(btn_limpar)
+        btn_salvar = QPushButton("Salvar log...")
+        btn_salvar.clicked.connect(self.salvar)
+        botoes_layout.addWidget(btn_salvar)
+        layout.addLayout(botoes_layout)
+        
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.atualizar)
+        
+    def showEvent(self, event):
+        self.atualizar()
+        self.timer.start()
+        super().showEvent(event)
+        
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+        
+    def atualizar(self):
+        self.label_estado.setText("Registrando" if perfil.ATIVO else "Registro desligado (menu Depurar)")
+        registros = list(perfil.registros)[-self.MAXIMO_LINHAS:]
+        # Só redesenha a tabela se chegaram registros novos
+        ultimo = registros[-1] if registros else None
+        if (len(registros), ultimo) == self.exibidos:
+            return
+        self.exibidos = (len(registros), ultimo)
+        self.tabela.setRowCount(len(registros))
+        for i, registro in enumerate(reversed(registros)):
+            valores = (datetime.fromtimestamp(registro.momento).strftime("%H:%M:%S.%f")[:-3],
+                       registro.tipo, registro.nome, f"{registro.duracao_ms:.2f}",
+                       "" if registro.linhas is None else str(registro.linhas), registro.thread,
+                       " | ".join(" ".join(sql.split()) for sql in registro.sql))
+            for coluna, valor in enumerate(valores):
+                self.tabela.setItem(i, coluna, QTableWidgetItem(valor))
+        
+    def limpar(self):
+        perfil.limpar()
+        self.atualizar()
+        
+    def salvar(self):
+        caminho, _ = QFileDialog.getSaveFileName(self, "Salvar log de desempenho", "perfil.log",
+                                                 "Log (*.log *.txt);;Todos os arquivos (*)")
+        if caminho:
+            perfil.salvar(caminho)
+
+class GerenciarCategoriasDialog(QDialog):
+    def __init__(self, banco, parent=None):
+        super().__init__(parent)
+        self.banco = banco
+        # Renomear ou mesclar muda as transações exibidas na janela principal
+        self.alterou_transacoes = False
         self.setWindowTitle("Gerenciar Categorias")
         self.setGeometry(200, 200, 400, 300)
         
@@ -40,225 +258,223 @@ class GerenciarCategoriasDialog(QDialog):
         btn_remover.clicked.connect(self.remover_categoria)
         form_layout.addWidget(btn_remover)
         
+        btn_renomear = QPushButton("Renomear")
+        btn_renomear.clicked.connect(self.renomear_categoria)
+        form_layout.addWidget(btn_renomear)
+        
+        btn_mesclar = QPushButton("Mesclar")
+        btn_mesclar.clicked.connect(self.mesclar_categoria)
+        form_layout.addWidget(btn_mesclar)
+        
         layout.addLayout(form_layout)
         
         # Carregar categorias
         self.carregar_categorias()
         
     def carregar_categorias(self):
-        conn = sqlite3.connect('financas.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT categoria FROM categorias ORDER BY categoria')
-        categorias = cursor.fetchall()
-        conn.close()
+        categorias = self.banco.listar_categorias()
         
         self.lista_categorias.setRowCount(len(categorias))
         for i, categoria in enumerate(categorias):
-            self.lista_categorias.setItem(i, 0, QTableWidgetItem(categoria[0]))
+            self.lista_categorias.setItem(i, 0, QTableWidgetItem(categoria))
             
     def adicionar_categoria(self):
         nova_categoria = self.nova_categoria.text().strip()
         if nova_categoria:
-            conn = sqlite3.connect('financas.db')
-            cursor = conn.cursor()
-            cursor.execute('INSERT INTO categorias (categoria) VALUES (?)', (nova_categoria,))
-            conn.commit()
-            conn.close()
+            try:
+                self.banco.adicionar_categoria(nova_categoria)
+            except sqlite3.OperationalError:
+                QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
+                return
             self.carregar_categorias()
             self.nova_categoria.clear()
             
-    def remover_categoria(self):
+    def categoria_selecionada(self):
         current_row = self.lista_categorias.currentRow()
         if current_row >= 0:
-            categoria = self.lista_categorias.item(current_row, 0).text()
-            conn = sqlite3.connect('financas.db')
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM categorias WHERE categoria = ?', (categoria,))
-            conn.commit()
-            conn.close()
+            return self.lista_categorias.item(current_row, 0).text()
+        return None
+            
+    def remover_categoria(self):
+        categoria = self.categoria_selecionada()
+        if categoria is not None:
+            try:
+                self.banco.remover_categoria(categoria)
+            except sqlite3.OperationalError:
+                QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
+                return
+            except ValueError as erro:
+                QMessageBox.warning(self, "Erro", str(erro))
+                return
+            self.carregar_categorias()
+            
+    def renomear_categoria(self):
+        categoria = self.categoria_selecionada()
+        if categoria is None:
+            return
+        nova, ok = QInputDialog.getText(self, "Renomear categoria", "Novo nome:", text=categoria)
+        nova = nova.strip()
+        if ok and nova and nova != categoria:
+            try:
+                self.banco.renomear_categoria(categoria, nova)
+            except sqlite3.OperationalError:
+                QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
+                return
+            except ValueError as erro:
+                QMessageBox.warning(self, "Erro", str(erro))
+                return
+            self.alterou_transacoes = True
+            self.carregar_categorias()
+            
+    def mesclar_categoria(self):
+        categoria = self.categoria_selecionada()
+        if categoria is None:
+            return
+        outras = [outra for outra in self.banco.listar_categorias() if outra != categoria]
+        destino, ok = QInputDialog.getItem(self, "Mesclar categoria",
+                                           f"Mover as transações de {categoria} para:",
+                                           outras, 0, False)
+        if ok and destino:
+            try:
+                self.banco.mesclar_categorias(categoria, destino)
+            except sqlite3.OperationalError:
+                QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
+                return
+            self.alterou_transacoes = True
             self.carregar_categorias()
 
-class GraficosWidget(QWidget):
-    def __init__(self, parent=None):
+class RecorrenciasDialog(QDialog):
+    COLUNAS = ["Descrição", "Tipo", "Valor", "Categoria", "Frequência", "Início", "Fim", "Próxima"]
+
+    def __init__(self, banco, parent=None):
         super().__init__(parent)
+        self.banco = banco
+        # Lançar ocorrências muda as transações exibidas na janela principal
+        self.alterou_transacoes = False
+        self.setWindowTitle("Transações recorrentes")
+        self.setGeometry(200, 200, 900, 400)
+        
         layout = QVBoxLayout(self)
         
-        # Filtro de mês
-        filtro_layout = QHBoxLayout()
-        self.mes_combo = QComboBox()
-        meses = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
-                "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
-        self.mes_combo.addItems(meses)
-        self.mes_combo.currentIndexChanged.connect(self.atualizar_graficos)
-        filtro_layout.addWidget(QLabel("Mês:"))
-        filtro_layout.addWidget(self.mes_combo)
+        self.lista_recorrencias = QTableWidget()
+        self.lista_recorrencias.setColumnCount(len(self.COLUNAS))
+        self.lista_recorrencias.setHorizontalHeaderLabels(self.COLUNAS)
+        self.lista_recorrencias.setSelectionBehavior(QTableWidget.SelectRows)
+        layout.addWidget(self.lista_recorrencias)
         
-        self.ano_spin = QSpinBox()
-        self.ano_spin.setRange(2000, 2100)
-        self.ano_spin.setValue(datetime.now().year)
-        self.ano_spin.valueChanged.connect(self.atualizar_graficos)
-        filtro_layout.addWidget(QLabel("Ano:"))
-        filtro_layout.addWidget(self.ano_spin)
+        # Área de nova regra
+        form_layout = QHBoxLayout()
+        self.descricao_input = QLineEdit()
+        self.descricao_input.setPlaceholderText("Descrição")
+        form_layout.addWidget(self.descricao_input)
+        
+        self.tipo_combo = QComboBox()
+        self.tipo_combo.addItems(["Receita", "Despesa"])
+        form_layout.addWidget(self.tipo_combo)
         
-        # Botões para diferentes tipos de gráficos
-        btn_layout = QHBoxLayout()
-        self.btn_despesas = QPushButton("Despesas por Categoria")
-        self.btn_despesas.clicked.connect(self.plotar_despesas_categoria)
-        btn_layout.addWidget(self.btn_despesas)
+        self.valor_input = QLineEdit()
+        self.valor_input.setPlaceholderText("Valor")
+        form_layout.addWidget(self.valor_input)
         
-        self.btn_evolucao = QPushButton("Evolução Mensal")
-        self.btn_evolucao.clicked.connect(self.plotar_evolucao_mensal)
-        btn_layout.addWidget(self.btn_evolucao)
+        self.categoria_combo = QComboBox()
+        self.categoria_combo.addItems(self.banco.listar_categorias())
+        form_layout.addWidget(self.categoria_combo)
         
-        layout.addLayout(filtro_layout)
-        layout.addLayout(btn_layout)
-        
-        # Criar figura do matplotlib
-        self.figure = Figure(figsize=(8, 6))
-        self.canvas = FigureCanvas(self.figure)
-        layout.addWidget(self.canvas)
-        
-    def atualizar_graficos(self):
-        if hasattr(self, 'ultimo_grafico'):
-            if self.ultimo_grafico == 'despesas':
-                self.plotar_despesas_categoria()
-            elif self.ultimo_grafico == 'evolucao':
-                self.plotar_evolucao_mensal()
-        
-    def plotar_despesas_categoria(self):
-        self.ultimo_grafico = 'despesas'
-        mes = self.mes_combo.currentIndex() + 1
-        ano = self.ano_spin.value()
+        self.frequencia_combo = QComboBox()
+        self.frequencia_combo.addItems(recorrencias.FREQUENCIAS)
+        form_layout.addWidget(self.frequencia_combo)
+        
+        self.inicio_edit = QDateEdit(QDate.currentDate())
+        self.inicio_edit.setCalendarPopup(True)
+        form_layout.addWidget(QLabel("Início:"))
+        form_layout.addWidget(self.inicio_edit)
+        
+        self.fim_check = QCheckBox("Fim:")
+        self.fim_edit = QDateEdit(QDate.currentDate().addYears(1))
+        self.fim_edit.setCalendarPopup(True)
+        self.fim_edit.setEnabled(False)
+        self.fim_check.toggled.connect(self.fim_edit.setEnabled)
+        form_layout.addWidget(self.fim_check)
+        form_layout.addWidget(self.fim_edit)
+        layout.addLayout(form_layout)
         
-        conn = sqlite3.connect('financas.db')
-        df = pd.read_sql_query('''
-            SELECT categoria, SUM(valor) as total
-            FROM transacoes
-            WHERE tipo = 'Despesa'
-            AND strftime('%m', data) = ?
-            AND strftime('%Y', data) = ?
-            GROUP BY categoria
-        ''', conn, params=(f"{mes:02d}", str(ano)))
-        conn.close()
-        
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        if not df.empty:
-            def func(pct, allvals):
-                valor = pct/100.*np.sum(allvals)
-                return f'{pct:.1f}%\nR$ {valor:.2f}'
-
-            wedges, texts, autotexts = ax.pie(
-                df['total'],
-                labels=df['categoria'],
-                autopct=lambda pct: func(pct, df['total']),
-                textprops=dict(color="black", fontsize=10, fontweight='bold'),
-                pctdistance=0.7,
-                labeldistance=1.1
-            )
-            ax.set_title(f'Despesas por Categoria - {self.mes_combo.currentText()}/{ano}')
-        else:
-            ax.text(0.5, 0.5, 'Sem dados para o período selecionado',
-                    horizontalalignment='center', verticalalignment='center')
-        self.canvas.draw()
+        botoes_layout = QHBoxLayout()
+        btn_adicionar = QPushButton("Adicionar")
+        btn_adicionar.clicked.connect(self.adicionar_recorrencia)
+        botoes_layout.addWidget(btn_adicionar)
         
-    def plotar_evolucao_mensal(self):
-        self.ultimo_grafico = 'evolucao'
-        ano = self.ano_spin.value()
-        meses_numeros = [f"{i:02d}" for i in range(1, 13)]
-        meses_labels = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
-                        'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-        conn = sqlite3.connect('financas.db')
-        df = pd.read_sql_query('''
-            SELECT 
-                strftime('%m', data) as mes,
-                SUM(CASE WHEN tipo = 'Receita' THEN valor ELSE 0 END) as receitas,
-                SUM(CASE WHEN tipo = 'Despesa' THEN valor ELSE 0 END) as despesas
-            FROM transacoes
-            WHERE strftime('%Y', data) = ?
-            GROUP BY mes
-            ORDER BY mes
-        ''', conn, params=(str(ano),))
-        conn.close()
-        receitas = []
-        despesas = []
-        saldo = []
-        saldo_acumulado = 0
-        for i, mes in enumerate(meses_numeros):
-            row = df[df['mes'] == mes]
-            receita_mes = float(row['receitas'].values[0]) if not row.empty else 0
-            despesa_mes = float(row['despesas'].values[0]) if not row.empty else 0
-            receitas.append(receita_mes)
-            despesas.append(despesa_mes)
-            saldo_acumulado += receita_mes - despesa_mes
-            saldo.append(saldo_acumulado)
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        if any(receitas) or any(despesas):
-            x = range(12)
-            width = 0.35
-            # Calculate monthly balances
-            monthly_balances = [r - d for r, d in zip(receitas, despesas)]
-
-            # Plot bars
-            rects1 = ax.bar([i - width/2 for i in x], receitas, width=width, label='Receitas', color='darkgrey')
-            rects2 = ax.bar([i + width/2 for i in x], despesas, width=width, label='Despesas', color='lightgrey')
-
-            # Add value labels on top of bars
-            def autolabel(rects, values):
-                for i, rect in enumerate(rects):
-                    height = rect.get_height()
-                    if height > 0:
-                         ax.text(rect.get_x() + rect.get_width()/2., height + 50,  # Ajuste o 50 conforme necessário para o espaçamento
-                                f'{values[i]:.0f}',
-                                ha='center', va='bottom', fontsize=9)
-
-            autolabel(rects1, receitas)
-            autolabel(rects2, despesas)
-
-            # Create custom x-axis labels with month and monthly balance
-            custom_xticks = []
-            for i in range(12):
-                month_label = meses_labels[i]
-                balance_label = f'R$ {monthly_balances[i]:.0f}' # Formato sem centavos e sem cor
-                custom_xticks.append(f'{month_label}\n{balance_label}')
-
-            ax.set_title(f'Evolução Mensal - {ano}')
-            ax.set_xlabel('Mês')
-            ax.set_ylabel('Valor (R$)')
-            ax.set_xticks(x)
-            ax.set_xticklabels(custom_xticks, fontsize=9)
-
-            # Remove the twinx axis if it exists (from previous code)
-            if hasattr(ax, 'twinx'):
-                 # Check if there's a second axis object associated
-                 if len(self.figure.axes) > 1:
-                    # Assuming ax2 is the second axis, remove it
-                    # A more robust way might involve checking the type or label if available
-                    if self.figure.axes[1] != ax:
-                        self.figure.delaxes(self.figure.axes[1])
-
-            #lines1, labels1 = ax.get_legend_handles_labels()
-            #ax.legend(lines1, labels1, loc='upper left') # Remove the second legend handle
-            ax.legend(loc='upper right') # Use upper right as in the image example
-
-            ax.grid(axis='y', linestyle='--', alpha=0.7) # Keep only horizontal grid lines
-            ax.set_ylim(0, max(max(receitas), max(despesas)) * 1.2) # Adjust y-limit for labels
-
-        else:
-            ax.text(0.5, 0.5, 'Sem dados para o período selecionado',
-                    horizontalalignment='center', verticalalignment='center')
-        self.figure.tight_layout()
-        self.canvas.draw()
+        btn_remover = QPushButton("Remover")
+        btn_remover.clicked.connect(self.remover_recorrencia)
+        botoes_layout.addWidget(btn_remover)
+        
+        btn_lancar = QPushButton("Lançar pendentes")
+        btn_lancar.clicked.connect(self.lancar_pendentes)
+        botoes_layout.addWidget(btn_lancar)
+        layout.addLayout(botoes_layout)
+        
+        self.carregar_recorrencias()
+        
+    def carregar_recorrencias(self):
+        self.regras = self.banco.listar_recorrencias()
+        self.lista_recorrencias.setRowCount(len(self.regras))
+        for i, regra in enumerate(self.regras):
+            proxima = next(recorrencias.ocorrencias(regra, date.max), None)
+            valores = (regra.descricao, regra.tipo, f"R$ {formatar_centavos(regra.valor_centavos)}",
+                       regra.categoria or "", regra.frequencia, regra.inicio, regra.fim or "",
+                       proxima[1].isoformat() if proxima else "encerrada")
+            for coluna, valor in enumerate(valores):
+                self.lista_recorrencias.setItem(i, coluna, QTableWidgetItem(valor))
+                
+    def adicionar_recorrencia(self):
+        descricao = self.descricao_input.text().strip()
+        if not descricao:
+            QMessageBox.warning(self, "Erro", "Por favor, preencha a descrição!")
+            return
+        try:
+            valor = para_centavos(self.valor_input.text())
+        except ValueError:
+            QMessageBox.warning(self, "Erro", "Por favor, insira um valor válido!")
+            return
+        fim = self.fim_edit.date().toString("yyyy-MM-dd") if self.fim_check.isChecked() else None
+        try:
+            self.banco.adicionar_recorrencia(descricao, self.tipo_combo.currentText(), valor,
+                                             self.categoria_combo.currentText(),
+                                             self.frequencia_combo.currentText(),
+                                             self.inicio_edit.date().toString("yyyy-MM-dd"), fim)
+        except sqlite3.OperationalError:
+            QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
+            return
+        self.descricao_input.clear()
+        self.valor_input.clear()
+        # Uma regra que começa hoje (ou antes) já tem ocorrências devidas
+        self.lancar_pendentes()
+        
+    def remover_recorrencia(self):
+        rows = sorted({index.row() for index in self.lista_recorrencias.selectionModel().selectedRows()})
+        if rows:
+            try:
+                for row in rows:
+                    self.banco.remover_recorrencia(self.regras[row].id)
+            except sqlite3.OperationalError:
+                QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
+            self.carregar_recorrencias()
+            
+    def lancar_pendentes(self):
+        try:
+            if recorrencias.materializar(self.banco):
+                self.alterou_transacoes = True
+        except sqlite3.OperationalError:
+            QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
+        self.carregar_recorrencias()
 
 class ControleFinanceiro(QMainWindow):
-    def __init__(self):
+    def __init__(self, banco=None):
         super().__init__()
         self.setWindowTitle("EVA CFP")
         self.setGeometry(100, 100, 1000, 800)
         
-        # Inicializa o banco de dados
-        self.inicializar_banco()
+        # Conexão única com o banco de dados (cria o esquema se necessário)
+        self.banco = banco or BancoDados()
         
         # Widget central com abas
         self.central_widget = QTabWidget()
@@ -268,12 +484,45 @@ class ControleFinanceiro(QMainWindow):
         self.tab_transacoes = QWidget()
         self.central_widget.addTab(self.tab_transacoes, "Transações")
         
-        # Aba de gráficos
-        self.tab_graficos = GraficosWidget()
-        self.central_widget.addTab(self.tab_graficos, "Gráficos")
+        # Aba de gráficos: o GraficosWidget (e com ele matplotlib e numpy) só é
+        # criado na primeira vez que a aba é selecionada
+        self.aba_graficos = QWidget()
+        QVBoxLayout(self.aba_graficos).setContentsMargins(0, 0, 0, 0)
+        self.tab_graficos = None
+        self.central_widget.addTab(self.aba_graficos, "Gráficos")
         
         self.central_widget.currentChanged.connect(self.atualizar_aba_graficos)
         
+        # Menu Arquivo
+        menu_arquivo = self.menuBar().addMenu("Arquivo")
+        acao_importar = QAction("Importar extrato (CSV/OFX)...", self)
+        acao_importar.triggered.connect(self.importar_extrato)
+        menu_arquivo.addAction(acao_importar)
+        acao_exportar_backup = QAction("Exportar backup...", self)
+        acao_exportar_backup.triggered.connect(self.exportar_backup)
+        menu_arquivo.addAction(acao_exportar_backup)
+        acao_importar_backup = QAction("Importar backup...", self)
+        acao_importar_backup.triggered.connect(self.importar_backup)
+        menu_arquivo.addAction(acao_importar_backup)
+        acao_recorrencias = QAction("Transações recorrentes...", self)
+        acao_recorrencias.triggered.connect(self.gerenciar_recorrencias)
+        menu_arquivo.addAction(acao_recorrencias)
+        # Ações que gravam no banco, desabilitadas durante as importações
+        self.acoes_escrita = [acao_importar, acao_importar_backup, acao_recorrencias]
+        self.executor = ExecutorTarefas(self)
+        
+        # Menu Depurar: registro de tempos das operações e consultas
+        menu_depurar = self.menuBar().addMenu("Depurar")
+        self.acao_perfil = QAction("Registrar tempos", self)
+        self.acao_perfil.setCheckable(True)
+        self.acao_perfil.setChecked(perfil.ATIVO)
+        self.acao_perfil.toggled.connect(self.alternar_perfil)
+        menu_depurar.addAction(self.acao_perfil)
+        acao_painel = QAction("Painel de desempenho...", self)
+        acao_painel.triggered.connect(self.abrir_painel_perfil)
+        menu_depurar.addAction(acao_painel)
+        self.painel_perfil = None
+        
         # Layout da aba de transações
         layout = QVBoxLayout(self.tab_transacoes)
         
@@ -297,6 +546,44 @@ class ControleFinanceiro(QMainWindow):
         
         layout.addLayout(filtro_layout)
         
+        # Busca: texto (índice FTS, por prefixo), categoria e faixa de valor
+        busca_layout = QHBoxLayout()
+        self.busca_input = QLineEdit()
+        self.busca_input.setPlaceholderText("Buscar na descrição ou categoria")
+        self.busca_input.setClearButtonEnabled(True)
+        busca_layout.addWidget(QLabel("Buscar:"))
+        busca_layout.addWidget(self.busca_input)
+        
+        self.busca_categoria = QComboBox()
+        busca_layout.addWidget(QLabel("Categoria:"))
+        busca_layout.addWidget(self.busca_categoria)
+        
+        self.busca_valor_min = QLineEdit()
+        self.busca_valor_min.setPlaceholderText("Mínimo")
+        self.busca_valor_max = QLineEdit()
+        self.busca_valor_max.setPlaceholderText("Máximo")
+        busca_layout.addWidget(QLabel("Valor de:"))
+        busca_layout.addWidget(self.busca_valor_min)
+        busca_layout.addWidget(QLabel("até:"))
+        busca_layout.addWidget(self.busca_valor_max)
+        
+        # Sem marcar, a busca percorre todo o histórico
+        self.busca_so_mes = QCheckBox("Só no mês selecionado")
+        busca_layout.addWidget(self.busca_so_mes)
+        
+        layout.addLayout(busca_layout)
+        
+        # Consulta enquanto se digita, esperando uma pausa curta entre as teclas
+        self.timer_busca = QTimer(self)
+        self.timer_busca.setSingleShot(True)
+        self.timer_busca.setInterval(150)
+        self.timer_busca.timeout.connect(self.aplicar_busca)
+        self.busca_input.textChanged.connect(self.timer_busca.start)
+        self.busca_valor_min.textChanged.connect(self.timer_busca.start)
+        self.busca_valor_max.textChanged.connect(self.timer_busca.start)
+        self.busca_categoria.currentIndexChanged.connect(self.aplicar_busca)
+        self.busca_so_mes.toggled.connect(self.aplicar_busca)
+        
         # Área de entrada de dados
         form_layout = QHBoxLayout()
         
@@ -328,22 +615,29 @@ class ControleFinanceiro(QMainWindow):
         btn_gerenciar_categorias = QPushButton("Gerenciar Categorias")
         btn_gerenciar_categorias.clicked.connect(self.gerenciar_categorias)
         form_layout.addWidget(btn_gerenciar_categorias)
+        self.acoes_escrita.append(btn_gerenciar_categorias)
         
         # Botão de adicionar
         btn_adicionar = QPushButton("Adicionar")
         btn_adicionar.clicked.connect(self.adicionar_transacao)
         form_layout.addWidget(btn_adicionar)
+        self.acoes_escrita.append(btn_adicionar)
         
         layout.addLayout(form_layout)
         
-        # Tabela de transações
-        self.tabela = QTableWidget()
-        self.tabela.setColumnCount(5)
-        self.tabela.setHorizontalHeaderLabels(["Data", "Tipo", "Valor", "Descrição", "Categoria"])
+        # Tabela de transações (modelo paginado + view)
+        self.modelo_transacoes = TransacoesModel(self.banco, self)
+        self.tabela = QTableView()
+        self.tabela.setModel(self.modelo_transacoes)
+        self.tabela.setSelectionBehavior(QTableView.SelectRows)
+        # Altura de linha fixa evita que a view meça cada linha carregada
+        self.tabela.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         layout.addWidget(self.tabela)
 
         # Conectar duplo clique para remover transação
-        self.tabela.itemDoubleClicked.connect(self.remover_transacao_duplo_clique)
+        self.tabela.doubleClicked.connect(self.remover_transacao_duplo_clique)
+        # Delete remove todas as linhas selecionadas
+        self.acoes_escrita.append(QShortcut(QKeySequence.Delete, self.tabela, self.remover_transacao))
 
         # Área de saldo
         saldo_layout = QHBoxLayout()
@@ -351,57 +645,56 @@ class ControleFinanceiro(QMainWindow):
         saldo_layout.addWidget(self.label_saldo)
         layout.addLayout(saldo_layout)
         
+        # Lança as transações recorrentes vencidas desde a última abertura. Se
+        # outro processo estiver gravando, elas ficam para a próxima abertura
+        # ou para "Lançar pendentes"
+        try:
+            recorrencias.materializar(self.banco)
+        except sqlite3.OperationalError:
+            self.statusBar().showMessage(
+                "Banco ocupado: as recorrências pendentes não foram lançadas", 10000)
+        
         # Carrega as transações
+        self.periodo = (None, None)
         self.carregar_transacoes()
         
-    def inicializar_banco(self):
-        conn = sqlite3.connect('financas.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transacoes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                data TEXT,
-                tipo TEXT,
-                valor REAL,
-                descricao TEXT,
-                categoria TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categorias (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                categoria TEXT UNIQUE
-            )
-        ''')
-        # Inserir categorias padrão se não existirem
-        categorias_padrao = ["Alimentação", "Transporte", "Moradia", "Lazer", "Outros"]
-        for categoria in categorias_padrao:
-            cursor.execute('INSERT OR IGNORE INTO categorias (categoria) VALUES (?)', (categoria,))
-        conn.commit()
-        conn.close()
-        
+    @perfil.medido
     def atualizar_categorias(self):
+        categorias = self.banco.listar_categorias()
         self.categoria_combo.clear()
-        conn = sqlite3.connect('financas.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT categoria FROM categorias ORDER BY categoria')
-        categorias = cursor.fetchall()
-        conn.close()
-        self.categoria_combo.addItems([cat[0] for cat in categorias])
+        self.categoria_combo.addItems(categorias)
+        # Mantém a categoria escolhida na busca, se ela ainda existir
+        selecionada = self.busca_categoria.currentText()
+        self.busca_categoria.blockSignals(True)
+        self.busca_categoria.clear()
+        self.busca_categoria.addItem("Todas")
+        self.busca_categoria.addItems(categorias)
+        self.busca_categoria.setCurrentIndex(max(self.busca_categoria.findText(selecionada), 0))
+        self.busca_categoria.blockSignals(False)
         
     def gerenciar_categorias(self):
-        dialog = GerenciarCategoriasDialog(self)
+        dialog = GerenciarCategoriasDialog(self.banco, self)
         dialog.exec_()
         self.atualizar_categorias()
+        if dialog.alterou_transacoes:
+            self.carregar_transacoes(*self.periodo)
+        
+    def gerenciar_recorrencias(self):
+        dialog = RecorrenciasDialog(self.banco, self)
+        dialog.exec_()
+        self.atualizar_categorias()
+        if dialog.alterou_transacoes:
+            self.carregar_transacoes(*self.periodo)
         
     def filtrar_por_mes(self):
         mes = self.mes_combo.currentIndex() + 1
         ano = self.ano_spin.value()
         self.carregar_transacoes(mes, ano)
         
+    @perfil.medido
     def adicionar_transacao(self):
         try:
-            valor = float(self.valor_input.text().replace(',', '.'))
+            valor = para_centavos(self.valor_input.text())
             descricao = self.descricao_input.text()
             tipo = self.tipo_combo.currentText()
             categoria = self.categoria_combo.currentText()
@@ -410,53 +703,83 @@ class ControleFinanceiro(QMainWindow):
                 QMessageBox.warning(self, "Erro", "Por favor, preencha a descrição!")
                 return
                 
-            conn = sqlite3.connect('financas.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO transacoes (data, tipo, valor, descricao, categoria)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tipo, valor, descricao, categoria))
-            conn.commit()
-            conn.close()
+            data = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            id_transacao = self.banco.adicionar_transacao(data, tipo, valor, descricao, categoria)
             
-            self.carregar_transacoes()
+            # Atualização incremental: só a nova linha e o delta do saldo
+            transacao = Transacao(id_transacao, data, tipo, valor, descricao, categoria)
+            if self.modelo_transacoes.pertence_ao_filtro(transacao):
+                self.modelo_transacoes.inserir(transacao)
+                self.ajustar_saldo(valor if tipo == "Receita" else -valor)
             self.limpar_campos()
             
+        except sqlite3.OperationalError:
+            QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
         except ValueError:
             QMessageBox.warning(self, "Erro", "Por favor, insira um valor válido!")
             
+    @perfil.medido
     def carregar_transacoes(self, mes=None, ano=None):
-        conn = sqlite3.connect('financas.db')
-        cursor = conn.cursor()
-        
-        if mes is not None and ano is not None:
-            cursor.execute('''
-                SELECT data, tipo, valor, descricao, categoria 
-                FROM transacoes 
-                WHERE strftime('%m', data) = ? AND strftime('%Y', data) = ?
-                ORDER BY data DESC
-            ''', (f"{mes:02d}", str(ano)))
+        self.periodo = (mes, ano)
+        filtro = self.filtro_busca()
+        if filtro and not self.busca_so_mes.isChecked():
+            mes = ano = None
+        self.modelo_transacoes.carregar(mes, ano, **filtro)
+        self.calcular_saldo()
+
+    def calcular_saldo(self):
+        mes, ano = self.modelo_transacoes.mes, self.modelo_transacoes.ano
+        filtro = self.modelo_transacoes.filtro
+        if not filtro:
+            # Sem busca, o saldo vem de totais_mensais e é imediato
+            self.executor.cancelar('saldo')
+            self.saldo = self.banco.saldo(mes, ano)
+            self.atualizar_label_saldo()
+            return
+        # Com busca, a soma percorre as transações encontradas: fica fora da
+        # thread da interface para não atrasar a digitação
+        self.saldo = None
+        self.label_saldo.setText("Saldo: calculando...")
+        self.executor.executar('saldo', self.banco.saldo, mes, ano,
+                               ao_concluir=self.saldo_calculado,
+                               ao_falhar=self.saldo_falhou, **filtro)
+
+    def saldo_calculado(self, saldo):
+        self.saldo = saldo
+        self.atualizar_label_saldo()
+
+    def saldo_falhou(self, mensagem):
+        self.label_saldo.setText("Saldo: indisponível")
+
+    def ajustar_saldo(self, delta):
+        if self.saldo is None:
+            # O cálculo em andamento pode não ter visto a alteração
+            self.calcular_saldo()
         else:
-            cursor.execute('SELECT data, tipo, valor, descricao, categoria FROM transacoes ORDER BY data DESC')
-            
-        transacoes = cursor.fetchall()
-        conn.close()
-        
-        self.tabela.setRowCount(len(transacoes))
-        saldo = 0
-        
-        for i, transacao in enumerate(transacoes):
-            for j, valor in enumerate(transacao):
-                if j == 2:  # Coluna de valor
-                    if transacao[1] == "Receita":
-                        saldo += valor
-                    else:
-                        saldo -= valor
-                    self.tabela.setItem(i, j, QTableWidgetItem(f"R$ {valor:.2f}"))
-                else:
-                    self.tabela.setItem(i, j, QTableWidgetItem(str(valor)))
-                    
-        self.label_saldo.setText(f"Saldo: R$ {saldo:.2f}")
+            self.saldo += delta
+            self.atualizar_label_saldo()
+
+    def filtro_busca(self):
+        """Filtros preenchidos na barra de busca; valores inválidos são ignorados."""
+        filtro = {}
+        texto = self.busca_input.text().strip()
+        if texto:
+            filtro['busca'] = texto
+        if self.busca_categoria.currentIndex() > 0:
+            filtro['categoria'] = self.busca_categoria.currentText()
+        for chave, campo in (('valor_min', self.busca_valor_min), ('valor_max', self.busca_valor_max)):
+            try:
+                filtro[chave] = para_centavos(campo.text())
+            except ValueError:
+                pass
+        return filtro
+
+    def aplicar_busca(self):
+        self.timer_busca.stop()
+        self.carregar_transacoes(*self.periodo)
+
+    def atualizar_label_saldo(self):
+        self.label_saldo.setText(f"Saldo: R$ {formatar_centavos(self.saldo)}")
         
     def limpar_campos(self):
         self.valor_input.clear()
@@ -465,54 +788,164 @@ class ControleFinanceiro(QMainWindow):
         self.categoria_combo.setCurrentIndex(0)
 
     def remover_transacao(self):
-        row = self.tabela.currentRow()
-        if row >= 0:
-            reply = QMessageBox.question(self, 'Remover Transação',
-                                         'Tem certeza que deseja remover a transação selecionada?',
+        rows = [index.row() for index in self.tabela.selectionModel().selectedRows()]
+        if rows:
+            if len(rows) == 1:
+                mensagem = 'Tem certeza que deseja remover a transação selecionada?'
+            else:
+                mensagem = f'Tem certeza que deseja remover as {len(rows)} transações selecionadas?'
+            reply = QMessageBox.question(self, 'Remover Transação', mensagem,
                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
-                data = self.tabela.item(row, 0).text()
-                tipo = self.tabela.item(row, 1).text()
-                valor = float(self.tabela.item(row, 2).text().replace('R$','').replace(',','.'))
-                descricao = self.tabela.item(row, 3).text()
-                categoria = self.tabela.item(row, 4).text()
-                conn = sqlite3.connect('financas.db')
-                cursor = conn.cursor()
-                cursor.execute('''DELETE FROM transacoes WHERE data=? AND tipo=? AND valor=? AND descricao=? AND categoria=?''',
-                               (data, tipo, valor, descricao, categoria))
-                conn.commit()
-                conn.close()
-                self.carregar_transacoes()
-
-    def remover_transacao_duplo_clique(self, item):
-        row = item.row()
-        if row >= 0:
+                self.remover_linhas(rows)
+
+    def remover_transacao_duplo_clique(self, index):
+        row = index.row()
+        if row >= 0 and not self.importando():
             reply = QMessageBox.question(self, 'Remover Transação',
                                          'Tem certeza que deseja remover a transação selecionada?',
                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
-                data = self.tabela.item(row, 0).text()
-                tipo = self.tabela.item(row, 1).text()
-                valor = float(self.tabela.item(row, 2).text().replace('R$','').replace(',','.'))
-                descricao = self.tabela.item(row, 3).text()
-                categoria = self.tabela.item(row, 4).text()
-                conn = sqlite3.connect('financas.db')
-                cursor = conn.cursor()
-                cursor.execute('''DELETE FROM transacoes WHERE data=? AND tipo=? AND valor=? AND descricao=? AND categoria=?''',
-                               (data, tipo, valor, descricao, categoria))
-                conn.commit()
-                conn.close()
-                self.carregar_transacoes()
+                self.remover_linhas([row])
+
+    @perfil.medido
+    def remover_linhas(self, rows):
+        transacoes = [self.modelo_transacoes.transacao(row) for row in rows]
+        try:
+            self.banco.remover_transacoes([transacao.id for transacao in transacoes])
+        except sqlite3.OperationalError:
+            QMessageBox.warning(self, "Erro", BANCO_OCUPADO)
+            return
+        self.modelo_transacoes.remover(rows)
+        delta = 0
+        for transacao in transacoes:
+            valor = transacao.valor_centavos
+            delta -= valor if transacao.tipo == "Receita" else -valor
+        self.ajustar_saldo(delta)
+
+    def importar_extrato(self):
+        caminho, _ = QFileDialog.getOpenFileName(self, "Importar extrato", "",
+                                                 "Extratos (*.csv *.ofx);;Todos os arquivos (*)")
+        if not caminho or self.importando():
+            return
+        self.statusBar().showMessage("Importando extrato...")
+        self.iniciar_importacao(importar_extrato_isolado, caminho,
+                                self.importacao_concluida, self.importacao_falhou)
+
+    def importando(self):
+        return self.executor.ocupado('importacao')
+
+    def iniciar_importacao(self, funcao, caminho, ao_concluir, ao_falhar):
+        """Roda a importação numa thread de trabalho, com conexão própria.
+
+        A importação segura a trava de escrita do banco até terminar; uma
+        gravação da interface nesse meio-tempo travaria a janela esperando por
+        ela, então as ações que gravam ficam desabilitadas até o fim.
+        """
+        self.habilitar_escrita(False)
+
+        def concluir(resultado):
+            self.habilitar_escrita(True)
+            ao_concluir(resultado)
+
+        def falhar(mensagem):
+            self.habilitar_escrita(True)
+            ao_falhar(mensagem)
+
+        self.executor.executar('importacao', funcao, self.banco.caminho, caminho,
+                               ao_concluir=concluir, ao_falhar=falhar)
+
+    def habilitar_escrita(self, habilitada):
+        for acao in self.acoes_escrita:
+            acao.setEnabled(habilitada)
+
+    @perfil.medido
+    def importacao_concluida(self, resultado):
+        lidas, importadas = resultado
+        self.statusBar().showMessage(f"{lidas} transações lidas, {importadas} importadas", 5000)
+        self.atualizar_categorias()
+        self.carregar_transacoes(*self.periodo)
+
+    def importacao_falhou(self, mensagem):
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Erro", f"Não foi possível importar o extrato:\n{mensagem}")
+
+    def exportar_backup(self):
+        caminho, filtro = QFileDialog.getSaveFileName(
+            self, "Exportar backup", f"dados-cfp-{date.today().isoformat()}.json",
+            ";;".join(filtro for filtro, _, _ in FORMATOS_BACKUP))
+        if not caminho or self.executor.ocupado('exportacao'):
+            return
+        # O formato vem do filtro escolhido; a extensão do nome é ajustada a ele
+        formato, extensao = next(((formato, extensao) for nome, formato, extensao in FORMATOS_BACKUP
+                                  if nome == filtro), FORMATOS_BACKUP[0][1:])
+        if not caminho.endswith(extensao):
+            for _, _, outra in FORMATOS_BACKUP:
+                if caminho.endswith(outra):
+                    caminho = caminho[:-len(outra)]
+            caminho += extensao
+        self.statusBar().showMessage("Exportando backup...")
+        # A conexão da thread de trabalho basta: só lê, além de fechar a versão
+        self.executor.executar('exportacao', sincronizacao.exportar, self.banco, caminho, formato,
+                               ao_concluir=lambda _: self.statusBar().showMessage(
+                                   f"Backup gravado em {caminho}", 5000),
+                               ao_falhar=self.backup_falhou)
+
+    def importar_backup(self):
+        caminho, _ = QFileDialog.getOpenFileName(self, "Importar backup", "",
+                                                 "Backups (*.json *.gz);;Todos os arquivos (*)")
+        if not caminho or self.importando():
+            return
+        resposta = QMessageBox.question(
+            self, "Importar backup",
+            "Um backup completo substitui todas as transações atuais. Continuar?")
+        if resposta != QMessageBox.Yes:
+            return
+        self.statusBar().showMessage("Importando backup...")
+        self.iniciar_importacao(importar_backup_isolado, caminho,
+                                self.backup_importado, self.backup_falhou)
+
+    def backup_importado(self, resultado):
+        gravadas, removidas = resultado
+        self.statusBar().showMessage(f"{gravadas} transações gravadas, {removidas} removidas", 5000)
+        self.atualizar_categorias()
+        self.carregar_transacoes(*self.periodo)
+
+    def backup_falhou(self, mensagem):
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Erro", f"Falha no backup:\n{mensagem}")
+
+    def alternar_perfil(self, ativo):
+        if ativo:
+            perfil.ativar(os.environ.get('EVA_CFP_PERFIL_LOG'))
+        else:
+            perfil.desativar()
+
+    def abrir_painel_perfil(self):
+        if self.painel_perfil is None:
+            self.painel_perfil = PainelPerfil(self)
+        self.painel_perfil.show()
+        self.painel_perfil.raise_()
 
     def atualizar_aba_graficos(self, index):
         # Se a aba de gráficos for selecionada, atualiza para mês/ano atual e plota o gráfico
         if self.central_widget.tabText(index) == "Gráficos":
             mes_atual = datetime.now().month - 1
             ano_atual = datetime.now().year
+            if self.tab_graficos is None:
+                from graficos import GraficosWidget
+                self.tab_graficos = GraficosWidget(self.banco)
+                self.aba_graficos.layout().addWidget(self.tab_graficos)
             self.tab_graficos.mes_combo.setCurrentIndex(mes_atual)
             self.tab_graficos.ano_spin.setValue(ano_atual)
             self.tab_graficos.plotar_despesas_categoria()
 
+    def closeEvent(self, event):
+        # Espera as tarefas em andamento antes de fechar as conexões
+        self.executor.aguardar()
+        self.banco.fechar()
+        super().closeEvent(event)
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = ControleFinanceiro()
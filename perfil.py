@@ -0,0 +1,131 @@
+"""Registro opcional de tempos das operações e consultas do EVA CFP.
+
+Desligado por padrão: as funções decoradas só fazem um teste de flag a mais.
+Liga-se pelo menu Depurar do aplicativo ou pelas variáveis de ambiente
+
+    EVA_CFP_PERFIL=1                 registra em memória (painel de desempenho)
+    EVA_CFP_PERFIL_LOG=perfil.log    registra também no arquivo, uma linha por registro
+
+Cada registro guarda a operação, a duração, a thread e, nas consultas ao
+banco, os comandos SQL executados e o número de linhas lidas ou alteradas.
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+Registro = namedtuple('Registro', 'momento tipo nome duracao_ms linhas sql thread')
+
+MAXIMO_REGISTROS = 5000
+
+ATIVO = False
+registros = deque(maxlen=MAXIMO_REGISTROS)
+_arquivo_log = None
+_trava_log = threading.Lock()
+# Consulta em andamento em cada thread: só a mais externa coleta o SQL
+_local = threading.local()
+
+
+def ativar(caminho_log=None):
+    global ATIVO, _arquivo_log
+    with _trava_log:
+        if caminho_log and _arquivo_log is None:
+            _arquivo_log = open(caminho_log, 'a', encoding='utf-8')
+    ATIVO = True
+
+
+def desativar():
+    global ATIVO, _arquivo_log
+    ATIVO = False
+    with _trava_log:
+        if _arquivo_log is not None:
+            _arquivo_log.close()
+            _arquivo_log = None
+
+
+def limpar():
+    registros.clear()
+
+
+def formatar(registro):
+    partes = [time.strftime('%H:%M:%S', time.localtime(registro.momento)),
+              f"{registro.duracao_ms:9.2f} ms", registro.tipo, registro.nome]
+    if registro.linhas is not None:
+        partes.append(f"{registro.linhas} linhas")
+    partes.append(f"[{registro.thread}]")
+    linha = '  '.join(partes)
+    for sql in registro.sql:
+        linha += '\n    ' + ' '.join(sql.split())
+    return linha
+
+
+def salvar(caminho):
+    """Grava os registros em memória num arquivo de texto."""
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        for registro in list(registros):
+            arquivo.write(formatar(registro) + '\n')
+
+
+def registrar(tipo, nome, inicio, linhas=None, sql=()):
+    registro = Registro(time.time(), tipo, nome, (time.perf_counter() - inicio) * 1000,
+                        linhas, tuple(sql), threading.current_thread().name)
+    registros.append(registro)
+    if _arquivo_log is not None:
+        with _trava_log:
+            if _arquivo_log is not None:
+                _arquivo_log.write(formatar(registro) + '\n')
+                _arquivo_log.flush()
+
+
+def medido(funcao):
+    """Decorador: registra a duração de cada chamada quando o perfil está ativo."""
+    nome = f"{funcao.__module__}.{funcao.__qualname__}"
+
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        if not ATIVO:
+            return funcao(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            registrar('operacao', nome, inicio)
+    return envoltorio
+
+
+def consulta(metodo):
+    """Decorador para métodos de BancoDados: além da duração, registra os
+    comandos SQL executados (pelo trace callback da conexão) e as linhas lidas
+    (tamanho da lista retornada) ou alteradas (total_changes, que inclui as
+    feitas pelos gatilhos).
+    """
+    nome = f"banco.{metodo.__qualname__}"
+
+    @functools.wraps(metodo)
+    def envoltorio(banco, *args, **kwargs):
+        if not ATIVO or getattr(_local, 'ativa', False):
+            return metodo(banco, *args, **kwargs)
+        conn = banco._conexao()
+        sql = []
+        alteracoes = conn.total_changes
+        _local.ativa = True
+        conn.set_trace_callback(sql.append)
+        inicio = time.perf_counter()
+        try:
+            resultado = metodo(banco, *args, **kwargs)
+        finally:
+            conn.set_trace_callback(None)
+            _local.ativa = False
+        if isinstance(resultado, list):
+            linhas = len(resultado)
+        else:
+            # Consultas de um valor só (saldo, por exemplo) ficam sem contagem
+            linhas = (conn.total_changes - alteracoes) or None
+        registrar('sql', nome, inicio, linhas, sql)
+        return resultado
+    return envoltorio
+
+
+if os.environ.get('EVA_CFP_PERFIL') or os.environ.get('EVA_CFP_PERFIL_LOG'):
+    ativar(os.environ.get('EVA_CFP_PERFIL_LOG'))
@@ -0,0 +1,89 @@
+"""Transações recorrentes: lançamento das ocorrências devidas e projeção das futuras.
+
+Cada regra (banco.Recorrencia) gera ocorrências numeradas a partir de 0; a
+ocorrência n é sempre calculada a partir da data de início, então o dia 31 de
+uma regra mensal vira 30 ou 28/29 nos meses mais curtos e volta a 31 depois.
+A regra guarda quantas ocorrências já foram lançadas, de modo que lançar as
+pendentes custa só as novas, e a projeção usa as que ainda faltam.
+"""
+import calendar
+from datetime import date, timedelta
+
+FREQUENCIAS = ('mensal', 'semanal', 'anual')
+
+
+def data_ocorrencia(inicio, frequencia, n):
+    """Data (date) da n-ésima ocorrência de uma regra iniciada em `inicio`."""
+    if frequencia == 'semanal':
+        return inicio + timedelta(weeks=n)
+    if frequencia == 'mensal':
+        ano, mes = divmod(inicio.month - 1 + n, 12)
+        ano += inicio.year
+        mes += 1
+    elif frequencia == 'anual':
+        ano, mes = inicio.year + n, inicio.month
+    else:
+        raise ValueError(f"Frequência inválida: {frequencia!r}")
+    return date(ano, mes, min(inicio.day, calendar.monthrange(ano, mes)[1]))
+
+
+def ocorrencias(regra, ate):
+    """Gera (n, data) das ocorrências ainda não lançadas da regra até a data `ate`."""
+    inicio = date.fromisoformat(regra.inicio)
+    if regra.fim:
+        ate = min(ate, date.fromisoformat(regra.fim))
+    n = regra.materializadas
+    while True:
+        data = data_ocorrencia(inicio, regra.frequencia, n)
+        if data > ate:
+            return
+        yield n, data
+        n += 1
+
+
+def _transacao(regra, data):
+    return (f"{data.isoformat()} 00:00:00", regra.tipo, regra.valor_centavos, regra.descricao,
+            regra.categoria, f"recorrencia:{regra.id}:{data.isoformat()}")
+
+
+def materializar(banco, hoje=None):
+    """Lança, numa única transação, todas as ocorrências devidas até hoje.
+
+    Retorna o número de transações inseridas. Sem nada pendente, custa só a
+    leitura das regras.
+    """
+    hoje = hoje or date.today()
+    transacoes = []
+    materializadas = []
+    for regra in banco.listar_recorrencias():
+        contagem = regra.materializadas
+        for n, data in ocorrencias(regra, hoje):
+            transacoes.append(_transacao(regra, data))
+            contagem = n + 1
+        if contagem != regra.materializadas:
+            materializadas.append((contagem, regra.id))
+    if not materializadas:
+        return 0
+    return banco.materializar_recorrencias(transacoes, materializadas)
+
+
+def projetar(banco, inicio, fim):
+    """Receitas e despesas previstas das ocorrências ainda não lançadas entre
+    `inicio` e `fim`, tuplas (ano, mes) inclusive, sem inserir nada no banco.
+
+    Retorna tuplas (ano, mes, receitas, despesas) em centavos, no formato de
+    BancoDados.evolucao_mensal.
+    """
+    ultimo_dia = date(fim[0], fim[1], calendar.monthrange(*fim)[1])
+    totais = {}
+    for regra in banco.listar_recorrencias():
+        for _, data in ocorrencias(regra, ultimo_dia):
+            if (data.year, data.month) < inicio:
+                continue
+            receitas, despesas = totais.get((data.year, data.month), (0, 0))
+            if regra.tipo == "Receita":
+                receitas += regra.valor_centavos
+            else:
+                despesas += regra.valor_centavos
+            totais[(data.year, data.month)] = (receitas, despesas)
+    return [(ano, mes, receitas, despesas) for (ano, mes), (receitas, despesas) in sorted(totais.items())]
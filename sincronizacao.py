@@ -0,0 +1,325 @@
+"""Backup e sincronização do banco do EVA CFP.
+
+Dois formatos, ambos lidos e gravados em lotes, sem carregar o banco inteiro:
+
+  json     o mesmo do aplicativo web (exportarDados/importarDados): um objeto
+           {"transacoes": [...], "categorias": [...]}, com valor em reais e
+           data ISO. Acrescenta valor_centavos (exato) e, nas exportações
+           incrementais, "desde" e a lista "removidas".
+  colunar  JSON Lines comprimido com gzip: um cabeçalho e uma linha por lote,
+           com as colunas em listas, categoria e tipo como índices de um
+           dicionário do lote e ids em diferenças; bem menor e mais rápido.
+
+Uma exportação completa substitui todas as transações ao ser importada (como no
+aplicativo web); uma incremental (desde > 0) só grava as alteradas, pelo id de
+origem, e apaga as removidas. A versão de cada exportação pode ser guardada
+por destino, e a seguinte parte dela:
+
+    python sincronizacao.py exportar backup.json [--banco financas.db]
+    python sincronizacao.py exportar delta.cfp.gz --incremental [--destino nuvem]
+    python sincronizacao.py importar backup.json
+"""
+import argparse
+import gzip
+import json
+from datetime import datetime
+
+from banco import BancoDados, para_centavos
+
+FORMATO_COLUNAR = 'eva-cfp-colunar'
+VERSAO_COLUNAR = 1
+DESTINO_PADRAO = 'padrao'
+TAMANHO_BLOCO = 1 << 16
+# Início de todo arquivo gzip
+ASSINATURA_GZIP = b'\x1f\x8b'
+
+
+def _item_json(transacao):
+    return {
+        'id': transacao.id,
+        'tipo': transacao.tipo,
+        'valor': transacao.valor_centavos / 100,
+        'valor_centavos': transacao.valor_centavos,
+        'descricao': transacao.descricao,
+        'categoria': transacao.categoria,
+        # Sem fuso: o navegador lê como hora local, igual ao banco
+        'data': transacao.data.replace(' ', 'T'),
+    }
+
+
+def converter_data(texto):
+    """Data ISO (com ou sem fuso, como a do toISOString do navegador) no
+    formato do banco, em hora local."""
+    data = datetime.fromisoformat(texto.replace('Z', '+00:00'))
+    if data.tzinfo is not None:
+        data = data.astimezone().replace(tzinfo=None)
+    return data.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def converter_item(item):
+    """Transação do JSON (desktop ou web) como tupla de BancoDados.aplicar_importacao."""
+    centavos = item.get('valor_centavos')
+    if not isinstance(centavos, int):
+        centavos = para_centavos(item['valor'])
+    return (item.get('id'), converter_data(item['data']), item['tipo'], centavos,
+            item.get('descricao', ''), item.get('categoria') or '')
+
+
+def exportar_json(leitura, arquivo, desde=0):
+    versao = next(leitura)[1]
+    categorias = next(leitura)[1]
+    arquivo.write('{\n')
+    arquivo.write(f'  "versao": {versao},\n  "desde": {desde},\n')
+    arquivo.write('  "categorias": ' + json.dumps(
+        [{'categoria': categoria} for categoria in categorias], ensure_ascii=False) + ',\n')
+    arquivo.write('  "transacoes": [')
+    secao = 'transacoes'
+    separador = '\n    '
+    for evento, lote in leitura:
+        if evento != secao:
+            # Depois das transações, só as removidas (exportação incremental)
+            arquivo.write('\n  ],\n  "removidas": [')
+            secao, separador = evento, '\n    '
+        if evento == 'transacoes':
+            itens = (json.dumps(_item_json(transacao), ensure_ascii=False) for transacao in lote)
+        else:
+            itens = (str(id_) for id_ in lote)
+        for item in itens:
+            arquivo.write(separador + item)
+            separador = ',\n    '
+    arquivo.write('\n  ]\n}\n')
+    return versao
+
+
+def _dicionario(valores):
+    indices = {}
+    return [indices.setdefault(valor, len(indices)) for valor in valores], list(indices)
+
+
+def exportar_colunar(leitura, arquivo, desde=0):
+    versao = next(leitura)[1]
+    categorias = next(leitura)[1]
+    arquivo.write(json.dumps({'formato': FORMATO_COLUNAR, 'versao_formato': VERSAO_COLUNAR,
+                              'versao': versao, 'desde': desde, 'categorias': categorias},
+                             ensure_ascii=False) + '\n')
+    total = 0
+    for evento, lote in leitura:
+        if evento == 'removidas':
+            arquivo.write(json.dumps({'removidas': lote}) + '\n')
+            continue
+        ids = [transacao.id for transacao in lote]
+        tipos, dicionario_tipos = _dicionario(transacao.tipo for transacao in lote)
+        categorias_lote, dicionario_categorias = _dicionario(transacao.categoria for transacao in lote)
+        arquivo.write(json.dumps({
+            'id': [ids[0]] + [atual - anterior for anterior, atual in zip(ids, ids[1:])],
+            'data': [transacao.data for transacao in lote],
+            'tipos': dicionario_tipos,
+            'tipo': tipos,
+            'valor_centavos': [transacao.valor_centavos for transacao in lote],
+            'descricao': [transacao.descricao for transacao in lote],
+            'categorias': dicionario_categorias,
+            'categoria': categorias_lote,
+        }, ensure_ascii=False, separators=(',', ':')) + '\n')
+        total += len(lote)
+    # Marca de fim: um arquivo truncado não é importado pela metade sem aviso
+    arquivo.write(json.dumps({'fim': True, 'transacoes': total}) + '\n')
+    return versao
+
+
+def formato_arquivo(caminho):
+    return 'colunar' if caminho.endswith('.gz') else 'json'
+
+
+def exportar(banco, caminho, formato=None, desde=0):
+    """Grava as transações (todas, ou as alteradas depois da versão `desde`)
+    em `caminho`. Retorna a versão exportada, de onde a próxima exportação
+    incremental deve partir."""
+    formato = formato or formato_arquivo(caminho)
+    leitura = banco.ler_exportacao(desde)
+    try:
+        if formato == 'colunar':
+            with gzip.open(caminho, 'wt', encoding='utf-8') as arquivo:
+                return exportar_colunar(leitura, arquivo, desde)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            return exportar_json(leitura, arquivo, desde)
+    finally:
+        leitura.close()
+
+
+def _valores_json(arquivo):
+    """Percorre o objeto JSON do topo lendo o arquivo em blocos: gera
+    (chave, elemento) para cada elemento das listas e (chave, valor) para os
+    demais valores, sem montar as listas inteiras na memória."""
+    decodificador = json.JSONDecoder()
+    texto = ''
+    posicao = 0
+    fim_arquivo = False
+
+    def ler_mais():
+        nonlocal texto, posicao, fim_arquivo
+        bloco = arquivo.read(TAMANHO_BLOCO)
+        fim_arquivo = not bloco
+        texto = texto[posicao:] + bloco
+        posicao = 0
+
+    def proximo_caractere():
+        nonlocal posicao
+        while True:
+            while posicao < len(texto) and texto[posicao].isspace():
+                posicao += 1
+            if posicao < len(texto):
+                return texto[posicao]
+            if fim_arquivo:
+                raise ValueError("Arquivo JSON incompleto")
+            ler_mais()
+
+    def consumir(esperados):
+        nonlocal posicao
+        caractere = proximo_caractere()
+        if caractere not in esperados:
+            raise ValueError(f"JSON inesperado perto de {texto[posicao:posicao + 20]!r}")
+        posicao += 1
+        return caractere
+
+    def valor():
+        nonlocal posicao
+        proximo_caractere()
+        while True:
+            try:
+                resultado, fim = decodificador.raw_decode(texto, posicao)
+            except json.JSONDecodeError:
+                if fim_arquivo:
+                    raise
+            else:
+                # Um número no fim do bloco pode continuar no próximo
+                if fim < len(texto) or fim_arquivo:
+                    posicao = fim
+                    return resultado
+            ler_mais()
+
+    consumir('{')
+    if proximo_caractere() == '}':
+        return
+    while True:
+        chave = valor()
+        consumir(':')
+        if proximo_caractere() == '[':
+            consumir('[')
+            if proximo_caractere() == ']':
+                consumir(']')
+            else:
+                while True:
+                    yield chave, valor()
+                    if consumir(',]') == ']':
+                        break
+        else:
+            yield chave, valor()
+        if consumir(',}') == '}':
+            return
+
+
+def eventos_json(arquivo):
+    """Eventos de BancoDados.aplicar_importacao lidos de um backup JSON."""
+    incremental = False
+    limpou = False
+    for chave, valor in _valores_json(arquivo):
+        if chave == 'desde':
+            incremental = bool(valor)
+        elif chave == 'categorias':
+            yield 'categoria', valor['categoria'] if isinstance(valor, dict) else valor
+        elif chave == 'transacoes':
+            if not incremental and not limpou:
+                limpou = True
+                yield 'limpar', None
+            yield 'transacao', converter_item(valor)
+        elif chave == 'removidas':
+            yield 'removida', valor
+    if not incremental and not limpou:
+        # Backup completo sem nenhuma transação
+        yield 'limpar', None
+
+
+def eventos_colunar(arquivo):
+    """Eventos de BancoDados.aplicar_importacao lidos de um arquivo colunar."""
+    cabecalho = json.loads(arquivo.readline() or 'null')
+    if not isinstance(cabecalho, dict) or cabecalho.get('formato') != FORMATO_COLUNAR:
+        raise ValueError("Arquivo não está no formato colunar do EVA CFP")
+    if cabecalho['versao_formato'] > VERSAO_COLUNAR:
+        raise ValueError(f"Versão do formato colunar não suportada: {cabecalho['versao_formato']}")
+    for categoria in cabecalho['categorias']:
+        yield 'categoria', categoria
+    if not cabecalho['desde']:
+        yield 'limpar', None
+    for linha in arquivo:
+        lote = json.loads(linha)
+        if 'fim' in lote:
+            return
+        if 'removidas' in lote:
+            for id_ in lote['removidas']:
+                yield 'removida', id_
+            continue
+        id_ = 0
+        for diferenca, data, tipo, centavos, descricao, categoria in zip(
+                lote['id'], lote['data'], lote['tipo'], lote['valor_centavos'],
+                lote['descricao'], lote['categoria']):
+            id_ += diferenca
+            yield 'transacao', (id_, data, lote['tipos'][tipo], centavos, descricao,
+                                lote['categorias'][categoria])
+    raise ValueError("Arquivo colunar incompleto")
+
+
+def importar(banco, caminho):
+    """Aplica um backup (completo ou incremental) ao banco. Retorna (gravadas, removidas)."""
+    with open(caminho, 'rb') as arquivo:
+        colunar = arquivo.read(2) == ASSINATURA_GZIP
+    if colunar:
+        with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+            return banco.aplicar_importacao(eventos_colunar(arquivo))
+    with open(caminho, encoding='utf-8-sig') as arquivo:
+        return banco.aplicar_importacao(eventos_json(arquivo))
+
+
+def exportar_incremental(banco, caminho, destino=DESTINO_PADRAO, formato=None):
+    """Exporta o que mudou desde a última exportação para `destino` e guarda a
+    nova versão. Retorna (desde, versao)."""
+    desde = banco.versao_sincronizada(destino)
+    versao = exportar(banco, caminho, formato, desde)
+    banco.registrar_sincronizacao(destino, versao)
+    return desde, versao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backup e sincronização do EVA CFP.")
+    parser.add_argument('--banco', help="caminho do banco SQLite (padrão: financas.db)")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    exportacao = comandos.add_parser('exportar', help="grava um backup")
+    exportacao.add_argument('arquivo', help="arquivo de saída (.json ou .gz)")
+    exportacao.add_argument('--formato', choices=('json', 'colunar'),
+                            help="padrão: colunar para .gz, json para os demais")
+    exportacao.add_argument('--incremental', action='store_true',
+                            help="só o que mudou desde a última exportação para o destino")
+    exportacao.add_argument('--destino', default=DESTINO_PADRAO,
+                            help="nome do destino da sincronização incremental")
+    importacao = comandos.add_parser('importar', help="aplica um backup")
+    importacao.add_argument('arquivos', nargs='+', help="backups, na ordem em que foram gerados")
+    args = parser.parse_args(argv)
+
+    banco = BancoDados(args.banco)
+    try:
+        if args.comando == 'exportar':
+            if args.incremental:
+                desde, versao = exportar_incremental(banco, args.arquivo, args.destino, args.formato)
+            else:
+                desde, versao = 0, exportar(banco, args.arquivo, args.formato)
+            print(f"{args.arquivo}: versões {desde + 1} a {versao}" if desde
+                  else f"{args.arquivo}: completo até a versão {versao}")
+        else:
+            for caminho in args.arquivos:
+                gravadas, removidas = importar(banco, caminho)
+                print(f"{caminho}: {gravadas} transações gravadas, {removidas} removidas")
+    finally:
+        banco.fechar()
+
+
+if __name__ == '__main__':
+    main()
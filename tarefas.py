@@ -0,0 +1,93 @@
+"""Execução de consultas e preparação de gráficos fora da thread da interface."""
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from banco import devolver_conexoes
+
+
+class SinaisTarefa(QObject):
+    # (canal, número da tarefa, resultado ou mensagem de erro)
+    concluida = Signal(str, int, object)
+    falhou = Signal(str, int, str)
+
+
+class Tarefa(QRunnable):
+    def __init__(self, canal, numero, sinais, cancelamento, funcao, args, kwargs):
+        super().__init__()
+        self.canal = canal
+        self.numero = numero
+        self.sinais = sinais
+        # O executor só guarda o Event: o QRunnable pertence ao pool depois do start()
+        self.cancelamento = cancelamento
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        if self.cancelamento.is_set():
+            return
+        try:
+            resultado = self.funcao(*self.args, **self.kwargs)
+        except Exception as erro:
+            if not self.cancelamento.is_set():
+                self.sinais.falhou.emit(self.canal, self.numero, str(erro))
+            return
+        finally:
+            devolver_conexoes()
+        if not self.cancelamento.is_set():
+            self.sinais.concluida.emit(self.canal, self.numero, resultado)
+
+
+class ExecutorTarefas(QObject):
+    """Executa funções no QThreadPool e entrega o resultado na thread da interface.
+
+    Cada tarefa pertence a um canal (por exemplo, 'grafico'). Enviar uma nova
+    tarefa num canal cancela a anterior: se ela ainda estiver na fila, nem
+    chega a rodar; se já estiver rodando, seu resultado é descartado.
+    """
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self.sinais = SinaisTarefa()
+        self.sinais.concluida.connect(self._concluida)
+        self.sinais.falhou.connect(self._falhou)
+        self.contador = 0
+        # canal -> (número, cancelamento, ao_concluir, ao_falhar)
+        self.ativas = {}
+
+    def executar(self, canal, funcao, *args, ao_concluir=None, ao_falhar=None, **kwargs):
+        self.cancelar(canal)
+        self.contador += 1
+        cancelamento = threading.Event()
+        self.ativas[canal] = (self.contador, cancelamento, ao_concluir, ao_falhar)
+        self.pool.start(Tarefa(canal, self.contador, self.sinais, cancelamento, funcao, args, kwargs))
+
+    def cancelar(self, canal):
+        anterior = self.ativas.pop(canal, None)
+        if anterior is not None:
+            anterior[1].set()
+
+    def ocupado(self, canal):
+        return canal in self.ativas
+
+    def aguardar(self):
+        self.pool.waitForDone()
+
+    def _finalizar(self, canal, numero):
+        ativa = self.ativas.get(canal)
+        if ativa is None or ativa[0] != numero:
+            # Resultado de uma tarefa já substituída
+            return None
+        del self.ativas[canal]
+        return ativa
+
+    def _concluida(self, canal, numero, resultado):
+        ativa = self._finalizar(canal, numero)
+        if ativa is not None and ativa[2] is not None:
+            ativa[2](resultado)
+
+    def _falhou(self, canal, numero, mensagem):
+        ativa = self._finalizar(canal, numero)
+        if ativa is not None and ativa[3] is not None:
+            ativa[3](mensagem)